@@ -1,44 +1,120 @@
+import asyncio
+import logging
+import os
+import sys
 import time
 import threading
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 from concurrent.futures import ThreadPoolExecutor
+
+from mia.metrics import MetricsRegistry, render_json, render_prometheus, snapshot
+
+from .async_runtime import AsyncBaseAgent, AsyncAgentRuntime, AsyncRedisRuntime
 from .base_agent import BaseAgent
+from .columnar import ColumnBatch, less_equal, scale, to_list
+from .inbox import OVERFLOW_BLOCK
+from .persistence import CheckpointError, KnowledgeLog, read_manifest, write_manifest
+from .scheduler import AgentScheduler
+from .transport import Transport, InProcessTransport, RedisStreamTransport
+from .triple_store import TripleStore
+
+# Cursore con cui il triple store del manager legge le knowledge base
+TRIPLES_CONSUMER = 'triple_store'
+
+logger = logging.getLogger(__name__)
+
+def build_atom(agent_id, index):
+    """Dati dell'index-esimo atomo creato da un agente chimico"""
+    return {
+        'element': ['H', 'O', 'C', 'N'][index % 4],
+        'id': f'atom_{agent_id}_{index}',
+        'properties': {
+            'mass': [1, 16, 12, 14][index % 4],
+            'electrons': [1, 8, 6, 7][index % 4]
+        }
+    }
+
+
+def build_analysis(agent_id, index, atom_data):
+    """Analisi fisica dell'atomo atom_data (index-esima dell'agente)"""
+    return {
+        'atom_id': atom_data['id'],
+        'element': atom_data['element'],
+        'analysis_id': f'analysis_{agent_id}_{index}',
+        'properties_calculated': {
+            'binding_energy': atom_data['properties']['electrons'] * 13.6,  # eV approssimativo
+            'stability': 'stable' if atom_data['properties']['electrons'] <= 8 else 'reactive'
+        },
+        'conclusion': f"Atomo {atom_data['element']} analizzato - {'Stabile' if atom_data['properties']['electrons'] <= 8 else 'Reattivo'}"
+    }
+
+
+def build_analyses(agent_id, first_index, atoms):
+    """
+    Analisi fisica di un lotto di atomi in un solo passaggio vettorizzato
+    
+    Equivale a build_analysis() chiamata su ogni atomo, con indici a partire
+    da first_index, ma calcola energia e stabilità sulle colonne del lotto e
+    formatta una conclusione per elemento invece che per atomo.
+    """
+    batch = ColumnBatch(atoms, {
+        'electrons': lambda atom: atom['properties']['electrons'],
+        'element': lambda atom: atom['element']
+    })
+    binding_energy = scale(batch['electrons'], 13.6)  # eV approssimativo
+    stable = less_equal(batch['electrons'], 8)
+    elements, codes = batch.codes('element')
+    conclusions = [(f"Atomo {element} analizzato - Reattivo", f"Atomo {element} analizzato - Stabile")
+                   for element in elements]
+    
+    return [{
+        'atom_id': atom['id'],
+        'element': elements[code],
+        'analysis_id': f'analysis_{agent_id}_{first_index + offset}',
+        'properties_calculated': {
+            'binding_energy': energy,
+            'stability': 'stable' if is_stable else 'reactive'
+        },
+        'conclusion': conclusions[code][is_stable]
+    } for offset, (atom, energy, is_stable, code)
+        in enumerate(zip(atoms, binding_energy, stable, to_list(codes)))]
+
 
 # Implementazioni specifiche degli agenti
 class ChemistAgent(BaseAgent):
     """Agente specializzato in chimica"""
     
-    def __init__(self, agent_id):
-        super().__init__(agent_id, "ChemistAgent")
+    interests = ('analysis',)
+    
+    def __init__(self, agent_id, transport=None):
+        super().__init__(agent_id, "ChemistAgent", transport)
         self.atoms_created = 0
+        # Crea un atomo ogni 5 secondi circa
+        self.every(5.0, self.create_atom)
     
     def process(self):
         """Logica principale del chimico"""
-        # Crea un atomo ogni 5 secondi circa
-        if time.time() % 5 < 1:
-            self.create_atom()
+        # La creazione degli atomi è un'attività periodica (vedi every)
+        pass
     
     def create_atom(self):
         """Crea un nuovo atomo e lo condivide"""
         self.atoms_created += 1
-        atom_data = {
-            'element': ['H', 'O', 'C', 'N'][self.atoms_created % 4],
-            'id': f'atom_{self.agent_id}_{self.atoms_created}',
-            'properties': {
-                'mass': [1, 16, 12, 14][self.atoms_created % 4],
-                'electrons': [1, 8, 6, 7][self.atoms_created % 4]
-            }
-        }
+        atom_data = build_atom(self.agent_id, self.atoms_created)
         
-        print(f"[{self.agent_id}] 🧪 Creato atomo: {atom_data['element']}")
+        logger.debug("[%s] 🧪 Creato atomo: %s", self.agent_id, atom_data['element'])
         self.share('atom', atom_data)
     
     def on_knowledge_received(self, knowledge_type, data, sender):
         """Reagisce alla conoscenza ricevuta"""
         if knowledge_type == 'analysis':
-            print(f"[{self.agent_id}] 🧪 Ricevuta analisi da {sender}: {data.get('conclusion', 'N/A')}")
-        elif knowledge_type == 'atom' and sender != self.agent_id:
-            print(f"[{self.agent_id}] 🧪 Altro chimico ha creato: {data.get('element', 'Unknown')}")
+            logger.debug("[%s] 🧪 Ricevuta analisi da %s: %s", self.agent_id, sender, data.get('conclusion', 'N/A'))
+    
+    def checkpoint_state(self):
+        return {'atoms_created': self.atoms_created}
+    
+    def restore_state(self, state):
+        self.atoms_created = state.get('atoms_created', self.atoms_created)
     
     def get_capabilities(self):
         return ["atom_creation", "molecular_analysis", "chemical_reactions"]
@@ -47,45 +123,108 @@ class ChemistAgent(BaseAgent):
 class PhysicsAgent(BaseAgent):
     """Agente specializzato in fisica"""
     
-    def __init__(self, agent_id):
-        super().__init__(agent_id, "PhysicsAgent")
+    interests = ('atom',)
+    
+    def __init__(self, agent_id, transport=None, batch=False):
+        """
+        Args:
+            batch (bool): Analizza gli atomi arrivati in un ciclo come un unico lotto
+                vettorizzato e li condivide in un solo envelope
+        """
+        super().__init__(agent_id, "PhysicsAgent", transport)
         self.analyses_performed = 0
+        self.batch = batch
     
     def process(self):
         """Logica principale del fisico"""
-        # Analizza gli atomi ricevuti
-        if 'atom' in self.knowledge_base:
-            atoms = self.knowledge_base['atom']
-            for atom_info in atoms:
-                if not atom_info.get('analyzed', False):
-                    self.analyze_atom(atom_info)
-                    atom_info['analyzed'] = True
+        # Analizza solo gli atomi arrivati dall'ultimo ciclo
+        if self.batch:
+            atoms = [atom_info['data'] for atom_info in self.iter_new('atom')]
+            if atoms:
+                self.analyze_batch(atoms)
+            return
+        for atom_info in self.iter_new('atom'):
+            self.analyze_atom(atom_info)
+    
+    def analyze_batch(self, atoms):
+        """Analizza un lotto di atomi e condivide le analisi in un solo envelope"""
+        analyses = build_analyses(self.agent_id, self.analyses_performed + 1, atoms)
+        self.analyses_performed += len(analyses)
+        
+        print(f"[{self.agent_id}] ⚛️  Analisi completate per {len(analyses)} atomi")
+        self.share_batch('analysis', analyses)
     
     def analyze_atom(self, atom_info):
         """Analizza un atomo e condivide l'analisi"""
         atom_data = atom_info['data']
         self.analyses_performed += 1
+        analysis = build_analysis(self.agent_id, self.analyses_performed, atom_data)
         
-        analysis = {
-            'atom_id': atom_data['id'],
-            'element': atom_data['element'],
-            'analysis_id': f'analysis_{self.agent_id}_{self.analyses_performed}',
-            'properties_calculated': {
-                'binding_energy': atom_data['properties']['electrons'] * 13.6,  # eV approssimativo
-                'stability': 'stable' if atom_data['properties']['electrons'] <= 8 else 'reactive'
-            },
-            'conclusion': f"Atomo {atom_data['element']} analizzato - {'Stabile' if atom_data['properties']['electrons'] <= 8 else 'Reattivo'}"
-        }
-        
-        print(f"[{self.agent_id}] ⚛️  Analisi completata per {atom_data['element']}")
+        logger.debug("[%s] ⚛️  Analisi completata per %s", self.agent_id, atom_data['element'])
         self.share('analysis', analysis)
     
     def on_knowledge_received(self, knowledge_type, data, sender):
         """Reagisce alla conoscenza ricevuta"""
         if knowledge_type == 'atom':
-            print(f"[{self.agent_id}] ⚛️  Nuovo atomo da analizzare: {data.get('element', 'Unknown')}")
-        elif knowledge_type == 'analysis' and sender != self.agent_id:
-            print(f"[{self.agent_id}] ⚛️  Altro fisico ha analizzato: {data.get('element', 'Unknown')}")
+            logger.debug("[%s] ⚛️  Nuovo atomo da analizzare: %s", self.agent_id, data.get('element', 'Unknown'))
+    
+    def checkpoint_state(self):
+        return {'analyses_performed': self.analyses_performed}
+    
+    def restore_state(self, state):
+        self.analyses_performed = state.get('analyses_performed', self.analyses_performed)
+    
+    def get_capabilities(self):
+        return ["atomic_analysis", "quantum_calculations", "energy_predictions"]
+
+
+class AsyncChemistAgent(AsyncBaseAgent):
+    """Agente chimico per il runtime asyncio"""
+    
+    interests = ('analysis',)
+    
+    def __init__(self, agent_id):
+        super().__init__(agent_id, "ChemistAgent")
+        self.atoms_created = 0
+        self.every(5.0, self.create_atom)
+    
+    async def process(self):
+        pass
+    
+    async def create_atom(self):
+        self.atoms_created += 1
+        await self.share('atom', build_atom(self.agent_id, self.atoms_created))
+    
+    def checkpoint_state(self):
+        return {'atoms_created': self.atoms_created}
+    
+    def restore_state(self, state):
+        self.atoms_created = state.get('atoms_created', self.atoms_created)
+    
+    def get_capabilities(self):
+        return ["atom_creation", "molecular_analysis", "chemical_reactions"]
+
+
+class AsyncPhysicsAgent(AsyncBaseAgent):
+    """Agente fisico per il runtime asyncio"""
+    
+    interests = ('atom',)
+    
+    def __init__(self, agent_id):
+        super().__init__(agent_id, "PhysicsAgent")
+        self.analyses_performed = 0
+    
+    async def process(self):
+        for atom_info in self.iter_new('atom'):
+            self.analyses_performed += 1
+            await self.share('analysis', build_analysis(self.agent_id, self.analyses_performed,
+                                                        atom_info['data']))
+    
+    def checkpoint_state(self):
+        return {'analyses_performed': self.analyses_performed}
+    
+    def restore_state(self, state):
+        self.analyses_performed = state.get('analyses_performed', self.analyses_performed)
     
     def get_capabilities(self):
         return ["atomic_analysis", "quantum_calculations", "energy_predictions"]
@@ -94,54 +233,118 @@ class PhysicsAgent(BaseAgent):
 class AgentManager:
     """Gestisce una società di agenti MIA"""
     
-    def __init__(self):
-        self.agents: List[BaseAgent] = []
+    def __init__(self, transport: Optional[Transport] = None,
+                 outbox_size: int = 0, outbox_delay: float = 0.05,
+                 inbox_size: int = 0, inbox_policy: str = OVERFLOW_BLOCK, inbox_workers: int = 1):
+        """
+        Args:
+            transport: Trasporto condiviso dagli agenti creati dal manager
+                (es. InProcessTransport per società in un solo processo).
+                Se None ogni agente apre la propria connessione Redis.
+            outbox_size: Se > 0 attiva l'outbox degli agenti aggiunti, con
+                flush ogni outbox_size messaggi o dopo outbox_delay secondi
+                e comunque a fine ciclo.
+            inbox_size: Se > 0 attiva l'inbox limitata degli agenti aggiunti,
+                con politica di overflow inbox_policy e inbox_workers handler.
+        """
+        self.transport = transport
+        self.outbox_size = outbox_size
+        self.outbox_delay = outbox_delay
+        self.inbox_size = inbox_size
+        self.inbox_policy = inbox_policy
+        self.inbox_workers = inbox_workers
+        self.agents: List[Union[BaseAgent, AsyncBaseAgent]] = []
         self.running = False
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.executor_workers = 0
+        self.scheduler: Optional[AgentScheduler] = None
         self.stats = {
             "total_cycles": 0,
             "active_agents": 0,
             "messages_shared": 0
         }
+        
+        # Metriche del manager; quelle degli agenti stanno in agent.metrics
+        self.metrics = MetricsRegistry({'component': 'manager'})
+        self.cycle_time = self.metrics.histogram('mia_cycle_seconds', 'Durata di un ciclo di tutti gli agenti')
+        self.metrics.gauge('mia_active_agents', 'Agenti attivi',
+                           function=lambda: sum(1 for agent in self.agents if agent.active))
+        self.metrics_sources: List[MetricsRegistry] = []
+        
+        # Vista EAV indicizzata della conoscenza di tutti gli agenti (vedi query_knowledge)
+        self.triples = TripleStore()
     
-    def add_agent(self, agent: BaseAgent) -> None:
+    def add_agent(self, agent: Union[BaseAgent, AsyncBaseAgent]) -> None:
         """Aggiunge un agente alla società"""
+        if self.outbox_size and isinstance(agent, BaseAgent):
+            agent.configure_outbox(self.outbox_size, self.outbox_delay)
+        if self.inbox_size and isinstance(agent, BaseAgent):
+            agent.configure_inbox(self.inbox_size, self.inbox_policy, self.inbox_workers)
         self.agents.append(agent)
+        if self.scheduler:
+            self.scheduler.add_agent(agent)
         print(f"✅ Aggiunto agente {agent.agent_id} ({agent.agent_type})")
     
-    def create_default_society(self) -> None:
-        """Crea una società di default con diversi tipi di agenti"""
-        # 2 agenti chimici
-        for i in range(2):
-            self.add_agent(ChemistAgent(f"ChemistAgent_{i:03d}"))
+    def create_default_society(self, asynchronous: bool = False, size: int = 2,
+                               batch_analysis: bool = False) -> None:
+        """
+        Crea una società di default con diversi tipi di agenti
+        
+        Args:
+            asynchronous: Crea agenti asyncio da eseguire con run_async()
+            size: Numero di agenti per tipo
+            batch_analysis: Agenti fisici in modalità lotto (vedi PhysicsAgent)
+        """
+        # Agenti chimici
+        for i in range(size):
+            agent_id = f"ChemistAgent_{i:03d}"
+            self.add_agent(AsyncChemistAgent(agent_id) if asynchronous
+                           else ChemistAgent(agent_id, self.transport))
         
-        # 2 agenti fisici
-        for i in range(2):
-            self.add_agent(PhysicsAgent(f"PhysicsAgent_{i:03d}"))
+        # Agenti fisici
+        for i in range(size):
+            agent_id = f"PhysicsAgent_{i:03d}"
+            self.add_agent(AsyncPhysicsAgent(agent_id) if asynchronous
+                           else PhysicsAgent(agent_id, self.transport, batch=batch_analysis))
         
         print(f"🏗️  Società creata con {len(self.agents)} agenti")
     
     def run_single_cycle(self) -> None:
         """Esegue un singolo ciclo per tutti gli agenti"""
+        started = time.monotonic()
         active_count = 0
         
+        # Pool riusato tra i cicli, ricreato solo se la società è cresciuta
+        if self.executor is None or self.executor_workers < len(self.agents):
+            if self.executor:
+                self.executor.shutdown(wait=True)
+            self.executor_workers = max(len(self.agents), 1)
+            self.executor = ThreadPoolExecutor(max_workers=self.executor_workers)
+        
         # Esegue tutti gli agenti in parallelo
-        with ThreadPoolExecutor(max_workers=len(self.agents)) as executor:
-            futures = []
-            for agent in self.agents:
-                if agent.active:
-                    future = executor.submit(agent.process)
-                    futures.append(future)
-                    active_count += 1
-            
-            # Aspetta che tutti completino
-            for future in futures:
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"❌ Errore nell'agente: {e}")
+        futures = []
+        for agent in self.agents:
+            if agent.active:
+                future = self.executor.submit(agent.step)
+                futures.append(future)
+                active_count += 1
+        
+        # Aspetta che tutti completino
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Errore nell'agente: {e}")
+        
+        # Pubblica i messaggi rimasti nelle outbox durante il ciclo
+        for agent in self.agents:
+            if agent.active:
+                agent.flush()
         
         self.stats["total_cycles"] += 1
         self.stats["active_agents"] = active_count
+        self.update_message_stats()
+        self.cycle_time.observe(time.monotonic() - started)
     
     def run_continuous(self, max_cycles: int = 20, cycle_delay: float = 3.0) -> None:
         """Esegue il sistema in modo continuo"""
@@ -167,21 +370,116 @@ class AgentManager:
         finally:
             self.stop()
     
+    def start_scheduler(self, max_workers: int = 8) -> AgentScheduler:
+        """Avvia lo scheduler event-driven senza bloccare il chiamante"""
+        self.running = True
+        self.scheduler = AgentScheduler(max_workers=max_workers)
+        for agent in self.agents:
+            self.scheduler.add_agent(agent)
+        self.scheduler.start()
+        return self.scheduler
+    
+    def run_scheduled(self, duration: float = 60.0, max_workers: int = 8,
+                      stats_interval: float = 5.0) -> None:
+        """
+        Esegue il sistema in modo event-driven per duration secondi
+        
+        Gli agenti vengono eseguiti da un pool fisso di max_workers thread
+        solo quando ricevono conoscenza o scade una loro attività periodica,
+        senza cicli a ritmo fisso.
+        """
+        print(f"🚀 Avvio sistema MIA event-driven per {duration:.0f}s "
+              f"({len(self.agents)} agenti, {max_workers} worker)...\n")
+        
+        self.start_scheduler(max_workers)
+        deadline = time.monotonic() + duration
+        try:
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(stats_interval, max(deadline - time.monotonic(), 0)))
+                self.stats["total_cycles"] = self.scheduler.stats["steps"]
+                self.stats["active_agents"] = sum(1 for agent in self.agents if agent.active)
+                self.update_message_stats()
+                self.print_stats()
+        except KeyboardInterrupt:
+            print("\n⏹️  Sistema fermato dall'utente...")
+        finally:
+            self.stop()
+    
+    def run_async(self, duration: float = 60.0, cycle_delay: float = 1.0,
+                  runtime: Optional[AsyncAgentRuntime] = None,
+                  stats_interval: float = 5.0) -> None:
+        """
+        Esegue una società di AsyncBaseAgent su un unico event loop
+        
+        Tutti gli agenti condividono il runtime: di default un solo client
+        Redis asincrono e un solo subscriber (AsyncRedisRuntime), che smista
+        broadcast e canali privati agli agenti locali.
+        
+        Args:
+            duration: Durata dell'esecuzione in secondi
+            cycle_delay: Pausa tra due step consecutivi di tutti gli agenti
+            runtime: Runtime da usare (es. AsyncAgentRuntime() senza Redis)
+        """
+        try:
+            asyncio.run(self._run_async(duration, cycle_delay, runtime, stats_interval))
+        except KeyboardInterrupt:
+            print("\n⏹️  Sistema fermato dall'utente...")
+        finally:
+            self.stop()
+    
+    async def _run_async(self, duration, cycle_delay, runtime, stats_interval):
+        runtime = runtime or AsyncRedisRuntime()
+        for agent in self.agents:
+            runtime.add_agent(agent)
+        await runtime.start()
+        self.running = True
+        print(f"🚀 Avvio sistema MIA asyncio per {duration:.0f}s ({len(self.agents)} agenti)...\n")
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+        next_stats = loop.time() + stats_interval
+        try:
+            while self.running and loop.time() < deadline:
+                active = [agent for agent in self.agents if agent.active]
+                results = await asyncio.gather(*(agent.step() for agent in active),
+                                               return_exceptions=True)
+                for agent, result in zip(active, results):
+                    if isinstance(result, Exception):
+                        print(f"❌ Errore nell'agente {agent.agent_id}: {result}")
+                
+                self.stats["total_cycles"] += 1
+                self.stats["active_agents"] = len(active)
+                self.update_message_stats()
+                if loop.time() >= next_stats:
+                    self.print_stats()
+                    next_stats = loop.time() + stats_interval
+                await asyncio.sleep(cycle_delay)
+        finally:
+            await runtime.stop()
+    
     def stop(self) -> None:
         """Ferma il sistema e tutti gli agenti"""
         self.running = False
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler = None
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
         for agent in self.agents:
             agent.stop()
+        if self.transport:
+            self.transport.close()
         print("🛑 Sistema MIA fermato.")
     
     def print_stats(self) -> None:
         """Stampa statistiche del sistema"""
         print(f"\n📊 Stats: Cicli={self.stats['total_cycles']}, "
-              f"Agenti_Attivi={self.stats['active_agents']}")
+              f"Agenti_Attivi={self.stats['active_agents']}, Messaggi={self.stats['messages_shared']}")
         
         # Stampa stato degli agenti
         for agent in self.agents:
-            kb_size = sum(len(knowledge) for knowledge in agent.knowledge_base.values())
+            kb_size = agent.knowledge_base.count()
             agent_type_short = agent.agent_type.replace('Agent', '')
             print(f"   🤖 {agent.agent_id}: KB={kb_size} elementi")
     
@@ -192,31 +490,137 @@ class AgentManager:
             agent_knowledge = {
                 "agent_id": agent.agent_id,
                 "agent_type": agent.agent_type,
-                "knowledge_base": agent.knowledge_base,
+                "knowledge_base": agent.knowledge_base.to_dict(),
                 "capabilities": agent.get_capabilities()
             }
             system_knowledge[agent.agent_id] = agent_knowledge
         
         return system_knowledge
     
+    def sync_triples(self) -> int:
+        """Importa nel triple store i record arrivati agli agenti dall'ultima sincronizzazione"""
+        return sum(self.triples.ingest(agent.knowledge_base, TRIPLES_CONSUMER) for agent in self.agents)
+    
+    def query_knowledge(self, *patterns: tuple) -> List[Dict[str, Any]]:
+        """
+        Interroga la conoscenza di sistema con pattern (entità, attributo, valore)
+        
+        '_' corrisponde a qualsiasi valore, '?x' è una variabile condivisa tra
+        i pattern (vedi TripleStore.query). Prima della query il triple store
+        viene aggiornato in modo incrementale.
+        
+        Esempio: query_knowledge(('?a', 'element', 'O'), ('?a', 'source_type', 'PhysicsAgent'))
+        """
+        self.sync_triples()
+        return self.triples.query(*patterns)
+    
+    # --- Persistenza ---
+    def checkpoint(self, directory: str, snapshot_every: int = 10000) -> int:
+        """
+        Salva in modo incrementale la conoscenza e lo stato degli agenti
+        
+        Ogni agente ha in directory un log append-only dei record arrivati
+        dall'ultimo checkpoint, compattato in uno snapshot ogni snapshot_every
+        record (vedi persistence.KnowledgeLog). Pensato per essere chiamato
+        periodicamente durante l'esecuzione.
+        
+        Returns:
+            int: Record scritti
+        """
+        os.makedirs(directory, exist_ok=True)
+        written = sum(KnowledgeLog(directory, agent.agent_id).checkpoint(
+            agent.knowledge_base, agent.checkpoint_state(), snapshot_every) for agent in self.agents)
+        write_manifest(directory, self.agents)
+        return written
+    
+    def restore(self, directory: str, factories: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Ricostruisce la società da un checkpoint: ultimo snapshot più coda del log
+        
+        Gli agenti già presenti con lo stesso id vengono ripristinati; gli
+        altri sono creati con factories[nome della classe](agent_id, transport)
+        (default: ChemistAgent e PhysicsAgent). Da chiamare prima dell'avvio:
+        i cursori di iter_new riprendono da dove erano, quindi la conoscenza
+        già elaborata non viene rielaborata.
+        
+        Returns:
+            int: Agenti ripristinati
+        
+        Raises:
+            CheckpointError: Se il checkpoint manca o un agente non ha factory
+        """
+        factories = factories or {'ChemistAgent': ChemistAgent, 'PhysicsAgent': PhysicsAgent}
+        existing = {agent.agent_id: agent for agent in self.agents}
+        entries = read_manifest(directory)['agents']
+        for entry in entries:
+            agent = existing.get(entry['agent_id'])
+            if agent is None:
+                factory = factories.get(entry['class'])
+                if factory is None:
+                    raise CheckpointError(f"Nessuna factory per {entry['class']} ({entry['agent_id']})")
+                agent = factory(entry['agent_id'], self.transport)
+                self.add_agent(agent)
+            agent.restore_state(KnowledgeLog(directory, entry['agent_id']).restore(agent.knowledge_base))
+            # Il triple store riparte vuoto e rilegge la conoscenza ripristinata
+            agent.knowledge_base.drop_cursor(TRIPLES_CONSUMER)
+        self.triples = TripleStore()
+        print(f"💾 Società ripristinata da {directory}: {len(entries)} agenti")
+        return len(entries)
+    
+    def knowledge_summary(self) -> Dict[str, Dict[str, int]]:
+        """Elementi conservati per agente e per tipo di conoscenza"""
+        return {agent.agent_id: agent.knowledge_base.counts() for agent in self.agents}
+    
     def demonstrate_collective_intelligence(self):
         """Dimostra l'intelligenza collettiva del sistema"""
-        print("\n🧠 DIMOSTRAZIONE INTELLIGENZA COLLETTIVA")
-        print("="*60)
-        
-        # Statistiche finali
-        total_knowledge = 0
-        for agent in self.agents:
-            agent_kb_size = sum(len(knowledge) for knowledge in agent.knowledge_base.values())
-            total_knowledge += agent_kb_size
-            print(f"🤖 {agent.agent_id}:")
-            for knowledge_type, items in agent.knowledge_base.items():
-                if items:
-                    print(f"   - {knowledge_type}: {len(items)} elementi")
+        print_collective_intelligence(self.knowledge_summary())
+    
+    # --- Metriche ---
+    def update_message_stats(self) -> None:
+        """Aggiorna stats["messages_shared"] dai contatori degli agenti"""
+        self.stats["messages_shared"] = sum(agent.metrics.sent.value for agent in self.agents)
+    
+    def add_metrics_source(self, source: Any) -> None:
+        """
+        Include nelle metriche esportate un altro componente
         
-        print(f"\n🎯 RISULTATO: Il sistema ha generato {total_knowledge} elementi di conoscenza!")
-        print("   📈 Gli agenti hanno collaborato creando, analizzando e condividendo informazioni")
-        print("   🔄 La conoscenza è fluita automaticamente tra diversi tipi di agenti")
+        Args:
+            source: MetricsRegistry o oggetto con attributo metrics (es. ClojureBridge)
+        """
+        self.metrics_sources.append(getattr(source, 'metrics', source))
+    
+    def _metric_registries(self) -> List[MetricsRegistry]:
+        return [self.metrics, *(agent.metrics.registry for agent in self.agents), *self.metrics_sources]
+    
+    def get_metrics(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Metriche di manager, agenti e sorgenti aggiunte: nome -> campioni con etichette"""
+        return snapshot(self._metric_registries())
+    
+    def export_metrics(self, fmt: str = "prometheus") -> str:
+        """
+        Esporta le metriche come testo Prometheus ("prometheus") o JSON ("json")
+        """
+        registries = self._metric_registries()
+        return render_json(registries) if fmt == "json" else render_prometheus(registries)
+
+
+def print_collective_intelligence(summary: Dict[str, Dict[str, int]]) -> None:
+    """Stampa il resoconto finale a partire da knowledge_summary()"""
+    print("\n🧠 DIMOSTRAZIONE INTELLIGENZA COLLETTIVA")
+    print("="*60)
+    
+    # Statistiche finali
+    total_knowledge = 0
+    for agent_id, counts in summary.items():
+        total_knowledge += sum(counts.values())
+        print(f"🤖 {agent_id}:")
+        for knowledge_type, count in counts.items():
+            if count:
+                print(f"   - {knowledge_type}: {count} elementi")
+    
+    print(f"\n🎯 RISULTATO: Il sistema ha generato {total_knowledge} elementi di conoscenza!")
+    print("   📈 Gli agenti hanno collaborato creando, analizzando e condividendo informazioni")
+    print("   🔄 La conoscenza è fluita automaticamente tra diversi tipi di agenti")
 
 
 # Script di test principale
@@ -224,11 +628,40 @@ if __name__ == "__main__":
     print("🌟 MIA - Meta-Intelligence Agent Framework")
     print("=" * 50)
     
-    manager = AgentManager()
-    manager.create_default_society()
+    # --in-process: società in un solo processo, senza Redis
+    in_process = "--in-process" in sys.argv
+    # --async: agenti asyncio con una sola connessione condivisa
+    asynchronous = "--async" in sys.argv
+    # --verbose: log di ogni messaggio inviato e ricevuto
+    logging.basicConfig(level=logging.DEBUG if "--verbose" in sys.argv else logging.WARNING,
+                        format='%(message)s')
+    
+    # --streams: Redis Streams con consumer group (consegna persistente, at-least-once)
+    if in_process and not asynchronous:
+        transport = InProcessTransport()
+    elif "--streams" in sys.argv and not asynchronous:
+        transport = RedisStreamTransport()
+    else:
+        transport = None
+    manager = AgentManager(transport)
+    # --batch: i fisici analizzano gli atomi a lotti vettorizzati
+    manager.create_default_society(asynchronous=asynchronous, batch_analysis="--batch" in sys.argv)
     
     print("\n⚠️  Per fermare il sistema: Ctrl+C")
     print("🔍 Osserva come gli agenti creano, condividono e analizzano conoscenza...\n")
     
-    manager.run_continuous(max_cycles=15, cycle_delay=4.0)
-    manager.demonstrate_collective_intelligence()
\ No newline at end of file
+    # --checkpoint DIR: riprende dal checkpoint in DIR (se esiste) e lo aggiorna alla fine
+    checkpoint_dir = sys.argv[sys.argv.index("--checkpoint") + 1] if "--checkpoint" in sys.argv else None
+    if checkpoint_dir and not asynchronous and os.path.exists(os.path.join(checkpoint_dir, "manifest.json")):
+        manager.restore(checkpoint_dir)
+    
+    if asynchronous:
+        manager.run_async(duration=60.0, runtime=AsyncAgentRuntime() if in_process else None)
+    # --scheduled: scheduler event-driven invece dei cicli a ritmo fisso
+    elif "--scheduled" in sys.argv:
+        manager.run_scheduled(duration=60.0)
+    else:
+        manager.run_continuous(max_cycles=15, cycle_delay=4.0)
+    if checkpoint_dir and not asynchronous:
+        print(f"💾 Checkpoint: {manager.checkpoint(checkpoint_dir)} record salvati in {checkpoint_dir}")
+    manager.demonstrate_collective_intelligence()
@@ -0,0 +1,312 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+import redis.asyncio as aioredis
+
+from . import envelope
+from .base_agent import AgentMetrics, BATCH_FIELD
+from .knowledge_store import KnowledgeStore, RetentionPolicy
+from .scheduler import AgentTimer
+from .transport import topic_channel
+
+
+class AsyncBaseAgent(ABC):
+    """
+    Agente asyncio: nessun thread né connessione propria.
+
+    La comunicazione passa dall'AsyncAgentRuntime a cui l'agente è registrato,
+    che condivide una sola connessione e un solo subscriber tra tutti gli
+    agenti locali. process() e on_knowledge_received() sono coroutine.
+    """
+
+    # Tipi di conoscenza ricevuti in broadcast (None = tutti, vedi BaseAgent.interests)
+    interests = None
+
+    def __init__(self, agent_id, agent_type):
+        self.agent_id = agent_id
+        self.agent_type = agent_type
+        self.knowledge_base = KnowledgeStore()
+        self.active = True
+        self.runtime = None
+        self.inbox = None
+        self.timers = []
+        self.metrics = AgentMetrics(agent_id, agent_type,
+                                    queue_depth=lambda: self.inbox.qsize() if self.inbox else None)
+
+        self.broadcast_channel = "mia_broadcast"
+        self.private_channel = f"mia_{self.agent_id}"
+
+    async def share(self, knowledge_type, data, target_agent=None):
+        """
+        Condivide conoscenza tramite il runtime
+
+        Args:
+            knowledge_type (str): Tipo di conoscenza (es: 'atom', 'analysis', 'hypothesis')
+            data (dict): Dati da condividere
+            target_agent (str, optional): ID agente specifico, None per broadcast
+        """
+        if not self.runtime:
+            print(f"[{self.agent_id}] Runtime non disponibile, impossibile condividere")
+            return False
+
+        message = {
+            'sender': self.agent_id,
+            'sender_type': self.agent_type,
+            'knowledge_type': knowledge_type,
+            'data': data,
+            'timestamp': time.time()
+        }
+        channel = f"mia_{target_agent}" if target_agent else topic_channel(self.broadcast_channel, knowledge_type)
+
+        try:
+            await self.runtime.publish(channel, message)
+            self.metrics.sent.inc()
+            return True
+        except Exception as e:
+            self.metrics.dropped.inc()
+            print(f"[{self.agent_id}] Errore condivisione: {e}")
+            return False
+
+    async def _process_received_knowledge(self, message_data):
+        knowledge_type = message_data['knowledge_type']
+        data = message_data['data']
+        sender = message_data['sender']
+
+        if isinstance(data, dict) and BATCH_FIELD in data:
+            # Lotto (vedi BaseAgent.share_batch): espanso nei singoli elementi
+            items = data[BATCH_FIELD]
+            self.knowledge_base.add_many(knowledge_type, items, sender,
+                                         message_data['timestamp'], message_data.get('sender_type'))
+            for item in items:
+                await self.on_knowledge_received(knowledge_type, item, sender)
+            return
+
+        self.knowledge_base.add(knowledge_type, data, sender,
+                                message_data['timestamp'], message_data.get('sender_type'))
+
+        await self.on_knowledge_received(knowledge_type, data, sender)
+
+    async def on_knowledge_received(self, knowledge_type, data, sender):
+        """Override negli agenti specifici per reagire alla conoscenza ricevuta"""
+        pass
+
+    def iter_new(self, knowledge_type, consumer='default'):
+        """Conoscenza arrivata dall'ultima chiamata (vedi BaseAgent.iter_new)"""
+        return iter(self.knowledge_base.read_new(knowledge_type, consumer))
+
+    def configure_retention(self, knowledge_type, max_items=None, ttl=None):
+        self.knowledge_base.set_policy(knowledge_type, RetentionPolicy(max_items, ttl))
+
+    def every(self, interval, callback):
+        """Registra un'attività periodica (callback sincrona o coroutine function)"""
+        timer = AgentTimer(interval, callback)
+        self.timers.append(timer)
+        return timer
+
+    async def step(self):
+        """Un passo di lavoro: attività periodiche scadute, poi process()"""
+        now = time.monotonic()
+        for timer in self.timers:
+            if timer.claim(now):
+                result = timer.callback()
+                if asyncio.iscoroutine(result):
+                    await result
+        await self.process()
+        self.metrics.process_time.observe(time.monotonic() - now)
+
+    def checkpoint_state(self):
+        """Stato proprio dell'agente da salvare nei checkpoint (vedi BaseAgent.checkpoint_state)"""
+        return {}
+
+    def restore_state(self, state):
+        pass
+
+    def stop(self):
+        self.active = False
+        print(f"[{self.agent_id}] Agente fermato")
+
+    @abstractmethod
+    async def process(self):
+        """Logica principale dell'agente - da implementare nelle sottoclassi"""
+        pass
+
+    @abstractmethod
+    def get_capabilities(self):
+        """Restituisce le capacità dell'agente - da implementare nelle sottoclassi"""
+        pass
+
+
+class AsyncAgentRuntime:
+    """
+    Runtime asyncio in memoria per AsyncBaseAgent.
+
+    Demultiplexa i messaggi sui canali broadcast (uno per tipo di conoscenza)
+    e privati verso le inbox degli agenti locali interessati; ogni agente ha
+    una sola task consumatrice.
+    """
+
+    def __init__(self, broadcast_channel="mia_broadcast", inbox_size=0):
+        """
+        Args:
+            broadcast_channel (str): Canale di broadcast condiviso
+            inbox_size (int): Capacità dell'inbox di ciascun agente (0 = illimitata)
+        """
+        self.broadcast_channel = broadcast_channel
+        self.inbox_size = inbox_size
+        self.agents = {}        # agent_id -> agente
+        self.private = {}       # canale privato -> agente
+        self.topics = {}        # tipo di conoscenza -> agenti che lo hanno dichiarato
+        self.wildcard = []      # agenti senza interests: ricevono tutti i tipi
+        self.tasks = {}         # agent_id -> task consumatrice
+        self.running = False
+
+    def add_agent(self, agent):
+        agent.runtime = self
+        agent.inbox = asyncio.Queue(self.inbox_size)
+        self.agents[agent.agent_id] = agent
+        self.private[agent.private_channel] = agent
+        if agent.interests is None:
+            self.wildcard.append(agent)
+        else:
+            for kind in agent.interests:
+                self.topics.setdefault(kind, []).append(agent)
+        if self.running:
+            self.tasks[agent.agent_id] = asyncio.create_task(self._consume(agent))
+
+    async def start(self):
+        self.running = True
+        for agent in self.agents.values():
+            self.tasks[agent.agent_id] = asyncio.create_task(self._consume(agent))
+
+    async def stop(self):
+        self.running = False
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks.clear()
+
+    async def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        """Consegna un envelope agli agenti locali interessati al canale"""
+        agent = self.private.get(channel)
+        if agent is not None:
+            if agent.active:
+                self._deliver(agent, message)
+            return
+        if not channel.startswith(f"{self.broadcast_channel}:"):
+            # Canale privato di un agente non locale: non va ridistribuito come broadcast
+            return
+        # Canale di un tipo: mittente e tipo vengono letti dall'header, senza decodificare il payload
+        sender = message['sender']
+        for agent in (*self.topics.get(message['knowledge_type'], ()), *self.wildcard):
+            if agent.agent_id != sender and agent.active:
+                self._deliver(agent, message)
+
+    def _deliver(self, agent, message):
+        try:
+            agent.inbox.put_nowait(message)
+        except asyncio.QueueFull:
+            agent.metrics.dropped.inc()
+            print(f"[{agent.agent_id}] Inbox piena, messaggio {message['knowledge_type']} scartato")
+
+    async def _consume(self, agent):
+        while True:
+            message = await agent.inbox.get()
+            agent.metrics.received.inc()
+            agent.metrics.delivery_lag.observe(time.time() - message['timestamp'])
+            try:
+                await agent._process_received_knowledge(message)
+            except Exception as e:
+                agent.metrics.dropped.inc()
+                print(f"[{agent.agent_id}] Errore processing messaggio: {e}")
+
+
+class AsyncRedisRuntime(AsyncAgentRuntime):
+    """
+    Runtime asyncio su Redis con una sola connessione e un solo subscriber.
+
+    Il subscriber è iscritto ai canali dei tipi di conoscenza dichiarati
+    dagli agenti locali (al pattern mia_broadcast:* se qualcuno li vuole
+    tutti) e ai loro canali privati mia_<agent_id>, e li smista alle inbox.
+    """
+
+    def __init__(self, host='localhost', port=6379, client=None,
+                 wire_format=envelope.WIRE_JSON, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client or aioredis.Redis(host=host, port=port)
+        self.wire_format = wire_format
+        self.pubsub = None
+        self.reader = None
+        self.subscribing = set()  # sottoscrizioni degli agenti aggiunti a runtime avviato
+        self.pattern_subscribed = False
+        self.subscribed_topics = set()
+
+    async def _subscribe(self, agents):
+        """Sottoscrive i canali privati e i tipi di conoscenza di un gruppo di agenti"""
+        channels = [agent.private_channel for agent in agents]
+        if self.wildcard:
+            # Con almeno un agente senza interests basta il pattern: i canali dei
+            # tipi in aggiunta farebbero arrivare due volte lo stesso messaggio
+            if not self.pattern_subscribed:
+                await self.pubsub.psubscribe(topic_channel(self.broadcast_channel, '*'))
+                self.pattern_subscribed = True
+                if self.subscribed_topics:
+                    await self.pubsub.unsubscribe(*self.subscribed_topics)
+                    self.subscribed_topics.clear()
+        else:
+            topics = {topic_channel(self.broadcast_channel, kind)
+                      for agent in agents for kind in agent.interests} - self.subscribed_topics
+            self.subscribed_topics |= topics
+            channels.extend(topics)
+        if channels:
+            await self.pubsub.subscribe(*channels)
+
+    def add_agent(self, agent):
+        super().add_agent(agent)
+        if self.pubsub is not None:
+            task = asyncio.create_task(self._subscribe([agent]))
+            self.subscribing.add(task)
+            task.add_done_callback(self._subscribed)
+
+    def _subscribed(self, task):
+        self.subscribing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[AsyncRedisRuntime] Errore sottoscrizione: {task.exception()}")
+
+    async def start(self):
+        await self.client.ping()
+        self.pubsub = self.client.pubsub()
+        await self._subscribe(list(self.agents.values()))
+        self.reader = asyncio.create_task(self._read())
+        await super().start()
+
+    async def stop(self):
+        await super().stop()
+        if self.subscribing:
+            await asyncio.gather(*self.subscribing, return_exceptions=True)
+        if self.reader:
+            self.reader.cancel()
+            await asyncio.gather(self.reader, return_exceptions=True)
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def publish(self, channel, message):
+        await self.client.publish(channel, envelope.encode(message, self.wire_format))
+
+    async def _read(self):
+        async for message in self.pubsub.listen():
+            if message['type'] not in ('message', 'pmessage'):
+                continue
+            try:
+                decoded = envelope.decode(message['data'])
+            except envelope.EnvelopeError:
+                print("[AsyncRedisRuntime] Messaggio malformato ricevuto")
+                continue
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            self.dispatch(channel, decoded)
@@ -1,44 +1,126 @@
+import logging
 import redis
-import json
 import threading
 import time
 from abc import ABC, abstractmethod
 
+from mia.metrics import MetricsRegistry
+
+from .inbox import Inbox, InboxClosed, OVERFLOW_BLOCK
+from .knowledge_store import KnowledgeStore, RetentionPolicy
+from .scheduler import AgentTimer
+from .transport import RedisTransport, topic_channel
+
+# I messaggi per-envelope (invio e ricezione) sono a livello DEBUG: stamparli
+# sempre costava più del trasporto stesso
+logger = logging.getLogger(__name__)
+
+# Campo del payload di un envelope che trasporta un lotto di elementi dello
+# stesso tipo (vedi BaseAgent.share_batch); il ricevente lo espande
+BATCH_FIELD = '_batch'
+
+
+class AgentMetrics:
+    """Metriche di un agente, con le etichette agent e agent_type"""
+
+    def __init__(self, agent_id, agent_type, queue_depth=None):
+        """
+        Args:
+            queue_depth (callable, optional): Funzione che restituisce la profondità
+                della coda del listener (None se non misurabile)
+        """
+        self.registry = MetricsRegistry({'agent': agent_id, 'agent_type': agent_type})
+        self.sent = self.registry.counter('mia_messages_sent_total', 'Envelope pubblicati')
+        self.received = self.registry.counter('mia_messages_received_total', 'Envelope ricevuti da altri agenti')
+        self.dropped = self.registry.counter(
+            'mia_messages_dropped_total', 'Envelope scartati (malformati, invio o elaborazione falliti)')
+        self.process_time = self.registry.histogram('mia_process_seconds', 'Durata di un passo di lavoro')
+        self.delivery_lag = self.registry.histogram(
+            'mia_delivery_lag_seconds', "Ritardo tra il timestamp dell'envelope e la ricezione")
+        if queue_depth is not None:
+            self.registry.gauge('mia_listener_queue_depth', 'Envelope in attesa nel listener',
+                                function=queue_depth)
+
+
 class BaseAgent(ABC):
-    def __init__(self, agent_id, agent_type):
+    # Tipi di conoscenza ricevuti in broadcast (None = tutti). Ogni tipo ha un
+    # canale mia_broadcast:<tipo>: dichiararli evita di ricevere, decodificare
+    # e memorizzare quelli che l'agente non usa.
+    interests = None
+    
+    def __init__(self, agent_id, agent_type, transport=None):
+        """
+        Args:
+            agent_id (str): Identificativo univoco dell'agente
+            agent_type (str): Tipo dell'agente (es: 'ChemistAgent')
+            transport (Transport, optional): Backend di comunicazione condiviso.
+                Se None viene aperta una connessione Redis dedicata.
+        """
         self.agent_id = agent_id
         self.agent_type = agent_type
-        self.knowledge_base = {}
+        self.knowledge_base = KnowledgeStore()
         self.active = True
         
-        # Connessione Redis per comunicazione multi-agente
-        try:
-            self.redis_client = redis.Redis(host='localhost', port=6379, decode_responses=True)
-            self.redis_client.ping()  # Test connessione
-            print(f"[{self.agent_id}] Connesso a Redis backplane")
-        except redis.ConnectionError:
-            print(f"[{self.agent_id}] ERRORE: Impossibile connettersi a Redis")
-            self.redis_client = None
-        
-        # Canali Redis
+        # Attività periodiche e notifica allo scheduler (vedi AgentScheduler)
+        self.timers = []
+        self.wakeup = None
+        self._stepped_seq = 0
+        
+        # Backend di comunicazione multi-agente (Redis di default)
+        self.owns_transport = transport is None
+        if transport is None:
+            try:
+                transport = RedisTransport()
+                print(f"[{self.agent_id}] Connesso a Redis backplane")
+            except redis.ConnectionError:
+                print(f"[{self.agent_id}] ERRORE: Impossibile connettersi a Redis")
+        self.transport = transport
+        
+        # Canali di comunicazione
         self.broadcast_channel = "mia_broadcast"
         self.private_channel = f"mia_{self.agent_id}"
         
+        # Sottoscrizione immediata, così nessun messaggio va perso prima dell'avvio del listener.
+        # I propri messaggi vengono scartati dal trasporto prima della decodifica.
+        self.subscription = None
+        if self.transport:
+            if self.interests is None:
+                topics, patterns = (), (topic_channel(self.broadcast_channel, '*'),)
+            else:
+                topics, patterns = tuple(topic_channel(self.broadcast_channel, kind) for kind in self.interests), ()
+            self.subscription = self.transport.subscribe(*topics, self.private_channel, patterns=patterns,
+                                                         consumer=self.agent_id, ignore_sender=self.agent_id)
+        
+        # Outbox: disattivata di default, ogni share() pubblica subito
+        self.outbox = {}  # canale -> lista di envelope in attesa
+        self.outbox_pending = 0
+        self.outbox_since = None
+        self.outbox_max_messages = 0
+        self.outbox_max_delay = 0.0
+        self.outbox_lock = threading.Lock()
+        
+        self.metrics = AgentMetrics(agent_id, agent_type,
+                                    queue_depth=self.subscription.pending if self.subscription else None)
+        
+        # Inbox: disattivata di default, i messaggi sono elaborati dal listener
+        self.inbox = None
+        self.inbox_workers = []
+        
         # Thread per ascoltare messaggi
         self.listener_thread = threading.Thread(target=self._listen_messages, daemon=True)
         self.listener_thread.start()
     
     def share(self, knowledge_type, data, target_agent=None):
         """
-        Condivide conoscenza via Redis
+        Condivide conoscenza tramite il trasporto configurato
         
         Args:
             knowledge_type (str): Tipo di conoscenza (es: 'atom', 'analysis', 'hypothesis')
             data (dict): Dati da condividere
             target_agent (str, optional): ID agente specifico, None per broadcast
         """
-        if not self.redis_client:
-            print(f"[{self.agent_id}] Redis non disponibile, impossibile condividere")
+        if not self.transport:
+            print(f"[{self.agent_id}] Trasporto non disponibile, impossibile condividere")
             return False
         
         message = {
@@ -49,22 +131,95 @@ class BaseAgent(ABC):
             'timestamp': time.time()
         }
         
+        # Messaggio privato o broadcast agli agenti interessati al tipo
+        channel = f"mia_{target_agent}" if target_agent else topic_channel(self.broadcast_channel, knowledge_type)
+        
         try:
+            if self.outbox_max_messages:
+                self._enqueue_outgoing(channel, message)
+            else:
+                self.transport.publish(channel, message)
+                self.metrics.sent.inc()
+            
             if target_agent:
-                # Messaggio privato
-                channel = f"mia_{target_agent}"
-                self.redis_client.publish(channel, json.dumps(message))
-                print(f"[{self.agent_id}] Inviato {knowledge_type} a {target_agent}")
+                logger.debug("[%s] Inviato %s a %s", self.agent_id, knowledge_type, target_agent)
             else:
-                # Broadcast a tutti gli agenti
-                self.redis_client.publish(self.broadcast_channel, json.dumps(message))
-                print(f"[{self.agent_id}] Broadcast {knowledge_type} a tutti gli agenti")
+                logger.debug("[%s] Broadcast %s a tutti gli agenti", self.agent_id, knowledge_type)
             
             return True
         except Exception as e:
+            self.metrics.dropped.inc()
             print(f"[{self.agent_id}] Errore condivisione: {e}")
             return False
     
+    def share_batch(self, knowledge_type, items, target_agent=None):
+        """
+        Condivide più elementi dello stesso tipo in un solo envelope
+        
+        I riceventi li espandono: ogni elemento finisce nella knowledge base
+        e passa da on_knowledge_received come se fosse arrivato da solo.
+        
+        Args:
+            knowledge_type (str): Tipo di conoscenza comune agli elementi
+            items (list): Payload dei singoli elementi
+            target_agent (str, optional): ID agente specifico, None per broadcast
+        """
+        if not items:
+            return True
+        return self.share(knowledge_type, {BATCH_FIELD: items}, target_agent)
+    
+    def configure_outbox(self, max_messages=100, max_delay=0.05):
+        """
+        Attiva la modalità outbox: i messaggi vengono bufferizzati per canale
+        e pubblicati in un unico lotto (pipeline Redis) al raggiungimento di
+        una delle soglie o alla chiamata di flush().
+        
+        Args:
+            max_messages (int): Messaggi in attesa che forzano il flush (0 disattiva l'outbox)
+            max_delay (float): Età massima in secondi del messaggio più vecchio in attesa
+        """
+        self.flush()
+        self.outbox_max_messages = max_messages
+        self.outbox_max_delay = max_delay
+    
+    def _enqueue_outgoing(self, channel, message):
+        """Accoda un envelope nell'outbox e svuota se è stata superata una soglia"""
+        with self.outbox_lock:
+            self.outbox.setdefault(channel, []).append(message)
+            self.outbox_pending += 1
+            if self.outbox_since is None:
+                self.outbox_since = time.monotonic()
+            due = (self.outbox_pending >= self.outbox_max_messages or
+                   time.monotonic() - self.outbox_since >= self.outbox_max_delay)
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """
+        Pubblica tutti i messaggi in attesa nell'outbox
+        
+        Returns:
+            int: Numero di messaggi pubblicati
+        """
+        with self.outbox_lock:
+            if not self.outbox_pending:
+                return 0
+            batch = [(channel, message)
+                     for channel, messages in self.outbox.items()
+                     for message in messages]
+            self.outbox = {}
+            self.outbox_pending = 0
+            self.outbox_since = None
+        
+        try:
+            published = self.transport.publish_batch(batch)
+            self.metrics.sent.inc(published)
+            return published
+        except Exception as e:
+            self.metrics.dropped.inc(len(batch))
+            print(f"[{self.agent_id}] Errore flush outbox ({len(batch)} messaggi): {e}")
+            return 0
+    
     def sync(self):
         """
         Sincronizza la knowledge base con i dati ricevuti
@@ -75,38 +230,105 @@ class BaseAgent(ABC):
     
     def _listen_messages(self):
         """
-        Thread che ascolta i messaggi Redis in background
+        Thread che ascolta i messaggi del trasporto in background
         """
-        if not self.redis_client:
+        if not self.subscription:
             return
         
-        # Sottoscrivi ai canali
-        pubsub = self.redis_client.pubsub()
-        pubsub.subscribe(self.broadcast_channel, self.private_channel)
-        
-        print(f"[{self.agent_id}] In ascolto su canali: {self.broadcast_channel}, {self.private_channel}")
+        topics = ', '.join(self.interests) if self.interests is not None else 'tutti'
+        print(f"[{self.agent_id}] In ascolto su canali: {self.broadcast_channel} ({topics}), {self.private_channel}")
         
-        for message in pubsub.listen():
+        for data in self.subscription.listen():
             if not self.active:
                 break
+            
+            if data is None:
+                self.metrics.dropped.inc()
+                print(f"[{self.agent_id}] Messaggio malformato ricevuto")
+                continue
+            
+            try:
+                # Non processare i propri messaggi (se il trasporto non li ha già scartati)
+                if data['sender'] == self.agent_id:
+                    continue
+                
+                self.metrics.received.inc()
+                self.metrics.delivery_lag.observe(time.time() - data['timestamp'])
+                logger.debug("[%s] Ricevuto %s da %s", self.agent_id, data['knowledge_type'], data['sender'])
                 
-            if message['type'] == 'message':
-                try:
-                    data = json.loads(message['data'])
-                    
-                    # Non processare i propri messaggi
-                    if data['sender'] == self.agent_id:
-                        continue
-                    
-                    print(f"[{self.agent_id}] Ricevuto {data['knowledge_type']} da {data['sender']}")
-                    
-                    # Processa il messaggio
+                # Processa il messaggio, o lo passa agli handler tramite l'inbox
+                inbox = self.inbox
+                if inbox is not None:
+                    inbox.put(data)
+                else:
                     self._process_received_knowledge(data)
-                    
-                except json.JSONDecodeError:
-                    print(f"[{self.agent_id}] Messaggio malformato ricevuto")
-                except Exception as e:
-                    print(f"[{self.agent_id}] Errore processing messaggio: {e}")
+                
+            except Exception as e:
+                self.metrics.dropped.inc()
+                print(f"[{self.agent_id}] Errore processing messaggio: {e}")
+    
+    def configure_inbox(self, capacity=1000, policy=OVERFLOW_BLOCK, workers=1, coalesce_key=None):
+        """
+        Attiva un'inbox limitata tra il listener e l'elaborazione dei messaggi
+        
+        Il listener si limita ad accodare; workers thread handler eseguono
+        _process_received_knowledge(). Con workers > 1 on_knowledge_received
+        può essere chiamato in parallelo e deve essere thread-safe.
+        
+        Args:
+            capacity (int): Messaggi massimi in attesa
+            policy (str): Politica di overflow (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+            workers (int): Numero di thread handler
+            coalesce_key (callable, optional): Chiave di coalescenza (vedi inbox.default_coalesce_key)
+        """
+        if self.inbox is not None:
+            raise RuntimeError("Inbox già configurata")
+        self.overflows = self.metrics.registry.counter(
+            'mia_inbox_overflow_total', "Overflow dell'inbox", {'policy': policy})
+        self.metrics.registry.gauge('mia_inbox_depth', "Messaggi in attesa nell'inbox",
+                                    function=lambda: len(self.inbox) if self.inbox else 0)
+        self.metrics.registry.gauge('mia_inbox_blocked_seconds', "Secondi passati dal listener in attesa di spazio nell'inbox",
+                                    function=lambda: self.inbox.stats["blocked_seconds"] if self.inbox else 0)
+        inbox = Inbox(capacity, policy, coalesce_key, on_overflow=self._inbox_overflow)
+        for index in range(workers):
+            worker = threading.Thread(target=self._handle_inbox, args=(inbox,),
+                                      name=f"{self.agent_id}-handler-{index}", daemon=True)
+            worker.start()
+            self.inbox_workers.append(worker)
+        self.inbox = inbox
+    
+    def _handle_inbox(self, inbox):
+        """Thread handler: elabora i messaggi dell'inbox fino alla sua chiusura"""
+        while True:
+            try:
+                data = inbox.get()
+            except InboxClosed:
+                return
+            try:
+                self._process_received_knowledge(data)
+            except Exception as e:
+                self.metrics.dropped.inc()
+                print(f"[{self.agent_id}] Errore processing messaggio: {e}")
+    
+    def _inbox_overflow(self, message, action):
+        self.overflows.inc()
+        if action == "dropped":
+            self.metrics.dropped.inc()
+        self.on_inbox_overflow(message, action)
+    
+    def on_inbox_overflow(self, message, action):
+        """
+        Override per reagire agli overflow dell'inbox (di default un warning ogni 100)
+        
+        Args:
+            message (dict): Envelope scartato, fuso o in attesa di spazio
+            action (str): "dropped", "coalesced" o "blocked"
+        """
+        count = self.overflows.value
+        if count == 1 or count % 100 == 0:
+            logger.warning("[%s] Inbox piena (%s, %d overflow): %s %s da %s", self.agent_id,
+                           self.inbox.policy if self.inbox else action, count, action,
+                           message['knowledge_type'], message['sender'])
     
     def _process_received_knowledge(self, message_data):
         """
@@ -119,18 +341,49 @@ class BaseAgent(ABC):
         data = message_data['data']
         sender = message_data['sender']
         
-        # Aggiungi alla knowledge base
-        if knowledge_type not in self.knowledge_base:
-            self.knowledge_base[knowledge_type] = []
+        if isinstance(data, dict) and BATCH_FIELD in data:
+            # Lotto (share_batch): un record e una notifica per ogni elemento
+            items = data[BATCH_FIELD]
+            self.knowledge_base.add_many(knowledge_type, items, sender,
+                                         message_data['timestamp'], message_data.get('sender_type'))
+            for item in items:
+                self.on_knowledge_received(knowledge_type, item, sender)
+        else:
+            # Aggiungi alla knowledge base
+            self.knowledge_base.add(knowledge_type, data, sender,
+                                    message_data['timestamp'], message_data.get('sender_type'))
+            
+            # Chiama il metodo specifico dell'agente per processare
+            self.on_knowledge_received(knowledge_type, data, sender)
         
-        self.knowledge_base[knowledge_type].append({
-            'data': data,
-            'source': sender,
-            'timestamp': message_data['timestamp']
-        })
+        # Risveglia l'agente se è gestito da uno scheduler event-driven
+        if self.wakeup:
+            self.wakeup(self)
+    
+    def iter_new(self, knowledge_type, consumer='default'):
+        """
+        Itera solo sulla conoscenza arrivata dall'ultima chiamata
         
-        # Chiama il metodo specifico dell'agente per processare
-        self.on_knowledge_received(knowledge_type, data, sender)
+        Sicuro da usare mentre il listener aggiunge nuovi elementi: gli
+        elementi arrivati durante l'iterazione saranno restituiti alla
+        chiamata successiva.
+        
+        Args:
+            knowledge_type (str): Tipo di conoscenza da consumare
+            consumer (str): Nome del cursore, per consumatori indipendenti nello stesso agente
+        """
+        yield from self.knowledge_base.read_new(knowledge_type, consumer)
+    
+    def configure_retention(self, knowledge_type, max_items=None, ttl=None):
+        """
+        Imposta la politica di conservazione della knowledge base per un tipo
+        
+        Args:
+            knowledge_type (str): Tipo di conoscenza
+            max_items (int, optional): Elementi massimi conservati (i più vecchi vengono scartati)
+            ttl (float, optional): Secondi dopo i quali un elemento scade
+        """
+        self.knowledge_base.set_policy(knowledge_type, RetentionPolicy(max_items, ttl))
     
     def on_knowledge_received(self, knowledge_type, data, sender):
         """
@@ -141,15 +394,63 @@ class BaseAgent(ABC):
             data (dict): Dati ricevuti
             sender (str): ID dell'agente mittente
         """
-        print(f"[{self.agent_id}] Processando {knowledge_type} da {sender}: {data}")
+        logger.debug("[%s] Processando %s da %s: %s", self.agent_id, knowledge_type, sender, data)
+    
+    def checkpoint_state(self):
+        """
+        Override per salvare nei checkpoint lo stato proprio dell'agente
+        
+        Returns:
+            dict: Stato JSON-serializzabile, restituito a restore_state() al ripristino
+        """
+        return {}
+    
+    def restore_state(self, state):
+        """Override per ripristinare lo stato salvato da checkpoint_state()"""
+        pass
     
     def stop(self):
         """Ferma l'agente e chiude le connessioni"""
+        if self.transport:
+            self.flush()
         self.active = False
-        if self.redis_client:
-            self.redis_client.close()
+        if self.subscription:
+            self.subscription.close()
+        if self.inbox is not None:
+            # Gli handler smaltiscono i messaggi già accodati e terminano
+            self.inbox.close()
+        if self.transport and self.owns_transport:
+            self.transport.close()
         print(f"[{self.agent_id}] Agente fermato")
     
+    def every(self, interval, callback):
+        """
+        Registra un'attività periodica eseguita da step()
+        
+        Args:
+            interval (float): Periodo in secondi
+            callback (callable): Funzione senza argomenti da eseguire
+        """
+        timer = AgentTimer(interval, callback)
+        self.timers.append(timer)
+        return timer
+    
+    def has_pending_work(self):
+        """True se è arrivata conoscenza dall'ultimo step() o un timer è scaduto"""
+        if self.knowledge_base.last_seq > self._stepped_seq:
+            return True
+        now = time.monotonic()
+        return any(timer.next_due <= now for timer in self.timers)
+    
+    def step(self):
+        """Un passo di lavoro dell'agente: attività periodiche scadute, poi process()"""
+        self._stepped_seq = self.knowledge_base.last_seq
+        now = time.monotonic()
+        for timer in self.timers:
+            timer.run_if_due(now)
+        self.process()
+        self.metrics.process_time.observe(time.monotonic() - now)
+    
     @abstractmethod
     def process(self):
         """Logica principale dell'agente - da implementare nelle sottoclassi"""
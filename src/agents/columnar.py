@@ -0,0 +1,77 @@
+try:
+    import numpy as np
+except ImportError:  # numpy è opzionale: senza, le colonne sono liste Python
+    np = None
+
+# Sotto questa dimensione il costo fisso di NumPy supera il guadagno: colonne come liste
+NUMPY_MIN_ROWS = 64
+
+
+class ColumnBatch:
+    """
+    Lotto di record in forma colonnare, per analisi vettorizzate.
+
+    Ogni campo diventa una colonna (array NumPy se disponibile e il lotto è
+    abbastanza grande, altrimenti lista) estratta una sola volta dai record;
+    le operazioni sulle colonne sostituiscono il ciclo Python per elemento.
+    Le funzioni di questo modulo accettano entrambe le rappresentazioni.
+    """
+
+    def __init__(self, records, fields):
+        """
+        Args:
+            records (list): Record del lotto (es. payload 'data' degli atomi)
+            fields (dict): Nome colonna -> funzione record -> valore
+        """
+        self.records = records
+        vectorized = np is not None and len(records) >= NUMPY_MIN_ROWS
+        self.columns = {name: _column([get(record) for record in records], vectorized)
+                        for name, get in fields.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def codes(self, name):
+        """
+        Codifica una colonna categoriale (es. l'elemento)
+
+        Returns:
+            tuple: (valori distinti, codice di ogni riga come indice nei valori distinti)
+        """
+        column = self.columns[name]
+        if _is_array(column):
+            uniques, codes = np.unique(column, return_inverse=True)
+            return uniques.tolist(), codes
+        index = {}
+        codes = [index.setdefault(value, len(index)) for value in column]
+        return list(index), codes
+
+
+def _column(values, vectorized):
+    return np.asarray(values) if vectorized else values
+
+
+def _is_array(column):
+    return np is not None and isinstance(column, np.ndarray)
+
+
+def scale(column, factor):
+    """column * factor, come lista di float Python"""
+    if _is_array(column):
+        return (column * factor).tolist()
+    return [value * factor for value in column]
+
+
+def less_equal(column, threshold):
+    """column <= threshold, come lista di bool Python"""
+    if _is_array(column):
+        return (column <= threshold).tolist()
+    return [value <= threshold for value in column]
+
+
+def to_list(column):
+    """Colonna come lista di valori Python"""
+    return column.tolist() if _is_array(column) else list(column)
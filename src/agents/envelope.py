@@ -0,0 +1,194 @@
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:  # msgpack è opzionale: senza, il payload binario resta JSON
+    msgpack = None
+
+# Formati di serializzazione negoziabili per gli envelope sul filo
+WIRE_JSON = 'json'
+WIRE_BINARY = 'binary'
+
+# Versione corrente del formato binario. Deve restare < 0x7b ('{'), così il
+# primo byte distingue sempre un envelope binario da uno JSON legacy.
+WIRE_VERSION = 1
+
+PAYLOAD_JSON = 0
+PAYLOAD_MSGPACK = 1
+
+# version, payload codec, timestamp, len(sender), len(sender_type), len(knowledge_type)
+_HEADER = struct.Struct('!BBdHHH')
+
+HEADER_FIELDS = ('sender', 'sender_type', 'knowledge_type', 'timestamp')
+
+_PENDING = object()
+
+
+class EnvelopeError(ValueError):
+    """Envelope malformato o di versione non supportata"""
+    pass
+
+
+class BinaryEnvelope:
+    """
+    Envelope binario decodificato in modo pigro.
+
+    I campi dell'header (sender, sender_type, knowledge_type, timestamp) sono
+    letti subito; il payload 'data' viene decodificato solo al primo accesso.
+    Supporta l'accesso in stile dict usato dagli agenti (envelope['sender']).
+    """
+
+    __slots__ = ('sender', 'sender_type', 'knowledge_type', 'timestamp',
+                 '_raw', '_offset', '_codec', '_data')
+
+    def __init__(self, raw):
+        if len(raw) < _HEADER.size:
+            raise EnvelopeError("Envelope troncato")
+        version, codec, timestamp, n_sender, n_type, n_kind = _HEADER.unpack_from(raw)
+        if version != WIRE_VERSION:
+            raise EnvelopeError(f"Versione envelope non supportata: {version}")
+
+        offset = _HEADER.size
+        end = offset + n_sender + n_type + n_kind
+        if len(raw) < end:
+            raise EnvelopeError("Header envelope troncato")
+        self.sender = bytes(raw[offset:offset + n_sender]).decode('utf-8')
+        offset += n_sender
+        self.sender_type = bytes(raw[offset:offset + n_type]).decode('utf-8')
+        offset += n_type
+        self.knowledge_type = bytes(raw[offset:offset + n_kind]).decode('utf-8')
+
+        self.timestamp = timestamp
+        self._raw = raw
+        self._offset = end
+        self._codec = codec
+        self._data = _PENDING
+
+    @property
+    def data(self):
+        if self._data is _PENDING:
+            payload = self._raw[self._offset:]
+            if self._codec == PAYLOAD_MSGPACK:
+                if msgpack is None:
+                    raise EnvelopeError("Payload msgpack ricevuto ma msgpack non è installato")
+                self._data = msgpack.unpackb(payload, raw=False)
+            elif self._codec == PAYLOAD_JSON:
+                self._data = json.loads(bytes(payload))
+            else:
+                raise EnvelopeError(f"Codec payload sconosciuto: {self._codec}")
+            self._raw = None
+        return self._data
+
+    def __getitem__(self, key):
+        if key == 'data':
+            return self.data
+        if key in HEADER_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key == 'data' or key in HEADER_FIELDS
+
+    def to_dict(self):
+        return {
+            'sender': self.sender,
+            'sender_type': self.sender_type,
+            'knowledge_type': self.knowledge_type,
+            'data': self.data,
+            'timestamp': self.timestamp
+        }
+
+
+def encode(message, wire_format=WIRE_JSON):
+    """
+    Serializza un envelope nel formato richiesto
+
+    Args:
+        message (dict): Envelope con sender, sender_type, knowledge_type, data, timestamp
+        wire_format (str): WIRE_JSON (legacy) o WIRE_BINARY
+
+    Returns:
+        str | bytes: Envelope serializzato
+    """
+    if wire_format == WIRE_JSON:
+        return json.dumps(message)
+    if wire_format != WIRE_BINARY:
+        raise ValueError(f"Formato envelope sconosciuto: {wire_format}")
+
+    sender = message['sender'].encode('utf-8')
+    sender_type = message['sender_type'].encode('utf-8')
+    knowledge_type = message['knowledge_type'].encode('utf-8')
+    if msgpack is not None:
+        codec, payload = PAYLOAD_MSGPACK, msgpack.packb(message['data'], use_bin_type=True)
+    else:
+        codec, payload = PAYLOAD_JSON, json.dumps(message['data']).encode('utf-8')
+
+    header = _HEADER.pack(WIRE_VERSION, codec, message['timestamp'],
+                          len(sender), len(sender_type), len(knowledge_type))
+    return b''.join((header, sender, sender_type, knowledge_type, payload))
+
+
+def sender_filter(sender):
+    """
+    Predicato che riconosce gli envelope serializzati di un mittente senza decodificarli
+
+    Negli envelope binari legge il mittente dall'header; in quelli JSON
+    prodotti da encode() il mittente è la prima chiave, quindi basta un
+    confronto di prefisso. Può dare falsi negativi (JSON scritto da altri),
+    mai falsi positivi: il chiamante deve comunque ricontrollare dopo decode().
+
+    Args:
+        sender (str): ID del mittente da riconoscere
+
+    Returns:
+        callable: raw (str | bytes) -> bool
+    """
+    sender_bytes = sender.encode('utf-8')
+    json_prefix = b'{"sender": ' + json.dumps(sender).encode('utf-8') + b','
+
+    def matches(raw):
+        if isinstance(raw, str):
+            raw = raw.encode('utf-8')
+        if not raw:
+            return False
+        if raw[0] == 0x7b:  # '{'
+            return raw.startswith(json_prefix)
+        if len(raw) < _HEADER.size or raw[0] != WIRE_VERSION:
+            return False
+        n_sender = _HEADER.unpack_from(raw)[3]
+        return n_sender == len(sender_bytes) and raw[_HEADER.size:_HEADER.size + n_sender] == sender_bytes
+
+    return matches
+
+
+def decode(raw):
+    """
+    Deserializza un envelope riconoscendo automaticamente il formato
+
+    Gli envelope binari restano pigri (BinaryEnvelope), quelli JSON legacy
+    vengono decodificati per intero in un dict: durante la migrazione i due
+    formati possono quindi convivere sullo stesso canale.
+
+    Raises:
+        EnvelopeError: Se l'envelope non è valido
+    """
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    if not raw:
+        raise EnvelopeError("Envelope vuoto")
+    if raw[0] == 0x7b:  # '{'
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise EnvelopeError(f"JSON non valido: {e}") from e
+    try:
+        return BinaryEnvelope(raw)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise EnvelopeError(f"Header binario non valido: {e}") from e
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+
+# Politiche di overflow dell'inbox
+OVERFLOW_BLOCK = "block"              # il listener attende spazio (backpressure verso il trasporto)
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # scarta il messaggio in attesa da più tempo
+OVERFLOW_COALESCE = "coalesce"        # un messaggio sostituisce quello in attesa con la stessa chiave
+
+
+class InboxClosed(Exception):
+    """L'inbox è stata chiusa e non contiene più messaggi"""
+
+
+def default_coalesce_key(message):
+    """
+    Chiave di coalescenza di default: mittente, tipo e id del payload
+
+    I messaggi senza id nel payload non vengono mai fusi.
+    """
+    data = message.get('data')
+    if not isinstance(data, dict):
+        return None
+    payload_id = data.get('id', data.get('analysis_id'))
+    if payload_id is None:
+        return None
+    return (message['sender'], message['knowledge_type'], payload_id)
+
+
+class Inbox:
+    """
+    Coda limitata tra il listener di un agente e i suoi handler.
+
+    Disaccoppia la lettura dal trasporto dall'elaborazione: un handler lento
+    riempie l'inbox invece di bloccare il subscriber, e all'overflow si
+    applica una politica esplicita invece di perdere messaggi a caso.
+    Con OVERFLOW_COALESCE un messaggio nuovo prende il posto di quello in
+    attesa con la stessa chiave (mantenendone la posizione); se l'inbox è
+    piena e la chiave è nuova si scarta il più vecchio.
+    """
+
+    def __init__(self, capacity, policy=OVERFLOW_BLOCK, coalesce_key=None, on_overflow=None):
+        """
+        Args:
+            capacity (int): Messaggi massimi in attesa
+            policy (str): OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST o OVERFLOW_COALESCE
+            coalesce_key (callable, optional): message -> chiave hashable o None (default: default_coalesce_key)
+            on_overflow (callable, optional): Chiamata come on_overflow(message, action) a ogni
+                overflow; action è "blocked", "dropped" o "coalesced" e message il messaggio interessato
+        """
+        if policy not in (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE):
+            raise ValueError(f"Politica di overflow sconosciuta: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.coalesce_key = coalesce_key or default_coalesce_key
+        self.on_overflow = on_overflow
+        self._entries = deque()  # slot [chiave, messaggio] in ordine di arrivo
+        self._keyed = {}         # chiave -> slot in attesa
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.stats = {"put": 0, "blocked": 0, "dropped": 0, "coalesced": 0, "blocked_seconds": 0.0}
+
+    def __len__(self):
+        return self._size
+
+    def put(self, message):
+        """
+        Accoda un messaggio applicando la politica di overflow
+
+        Returns:
+            bool: False se l'inbox è stata chiusa
+        """
+        if self.policy == OVERFLOW_BLOCK:
+            return self._put_blocking(message)
+        events = []
+        with self._lock:
+            if self._closed:
+                return False
+            key = self.coalesce_key(message) if self.policy == OVERFLOW_COALESCE else None
+            if key is not None and key in self._keyed:
+                self._keyed[key][1] = message
+                self.stats["coalesced"] += 1
+                self.stats["put"] += 1
+                events.append((message, "coalesced"))
+            else:
+                if self._size >= self.capacity:
+                    events.append((self._pop_oldest(), "dropped"))
+                    self.stats["dropped"] += 1
+                self._append(key, message)
+        # Fuori dal lock: l'handler di overflow può loggare o aggiornare metriche
+        if self.on_overflow:
+            for event_message, action in events:
+                self.on_overflow(event_message, action)
+        return True
+
+    def _put_blocking(self, message):
+        """
+        put() con OVERFLOW_BLOCK: attende spazio se l'inbox è piena
+
+        L'overflow è segnalato quando l'attesa inizia, non quando finisce,
+        così un listener bloccato è visibile mentre è bloccato; la durata
+        dell'attesa si accumula in stats["blocked_seconds"].
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            if self._size < self.capacity:
+                self._append(None, message)
+                return True
+            self.stats["blocked"] += 1
+        if self.on_overflow:
+            self.on_overflow(message, "blocked")
+        started = time.monotonic()
+        with self._lock:
+            while self._size >= self.capacity and not self._closed:
+                self._not_full.wait()
+            self.stats["blocked_seconds"] += time.monotonic() - started
+            if self._closed:
+                return False
+            self._append(None, message)
+            return True
+
+    def _append(self, key, message):
+        slot = [key, message]
+        self._entries.append(slot)
+        if key is not None:
+            self._keyed[key] = slot
+        self._size += 1
+        self.stats["put"] += 1
+        self._not_empty.notify()
+
+    def _pop_oldest(self):
+        key, message = self._entries.popleft()
+        if key is not None:
+            del self._keyed[key]
+        self._size -= 1
+        return message
+
+    def get(self, timeout=None):
+        """
+        Estrae il messaggio più vecchio, attendendo se l'inbox è vuota
+
+        Raises:
+            InboxClosed: Se l'inbox è chiusa e vuota
+            TimeoutError: Se scade timeout senza messaggi
+        """
+        with self._lock:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._size:
+                if self._closed:
+                    raise InboxClosed()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError()
+                self._not_empty.wait(remaining)
+            message = self._pop_oldest()
+            self._not_full.notify()
+            return message
+
+    def close(self):
+        """Rifiuta nuovi messaggi; quelli in attesa restano estraibili"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def clear(self):
+        """Scarta i messaggi in attesa e restituisce quanti erano"""
+        with self._lock:
+            discarded = self._size
+            self._entries.clear()
+            self._keyed.clear()
+            self._size = 0
+            self._not_full.notify_all()
+            return discarded
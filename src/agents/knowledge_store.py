@@ -0,0 +1,395 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+
+
+class KnowledgeRecord:
+    """
+    Elemento di conoscenza ricevuto da un agente.
+
+    Usa __slots__ per contenere la memoria; per compatibilità con la vecchia
+    knowledge_base a dizionari supporta anche record['data'], record.get(...)
+    e l'assegnazione di chiavi aggiuntive (es. record['analyzed'] = True).
+    """
+
+    __slots__ = ('knowledge_type', 'data', 'source', 'source_type', 'timestamp', 'received', 'seq', 'meta')
+
+    _FIELDS = frozenset(('knowledge_type', 'data', 'source', 'source_type', 'timestamp', 'received', 'seq'))
+
+    def __init__(self, knowledge_type, data, source, timestamp, source_type=None, received=None, seq=0):
+        self.knowledge_type = knowledge_type
+        self.data = data
+        self.source = source
+        self.source_type = source_type
+        self.timestamp = timestamp
+        self.received = received if received is not None else time.time()
+        self.seq = seq
+        self.meta = None
+
+    def __getitem__(self, key):
+        if key in self._FIELDS:
+            return getattr(self, key)
+        if self.meta and key in self.meta:
+            return self.meta[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.meta is None:
+                self.meta = {}
+            self.meta[key] = value
+
+    def __contains__(self, key):
+        return key in self._FIELDS or bool(self.meta and key in self.meta)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Rappresentazione a dizionario nel formato della knowledge_base originale"""
+        record = {'data': self.data, 'source': self.source, 'timestamp': self.timestamp}
+        if self.meta:
+            record.update(self.meta)
+        return record
+
+
+class RetentionPolicy:
+    """
+    Politica di conservazione per un tipo di conoscenza
+
+    Args:
+        max_items (int, optional): Numero massimo di elementi (buffer circolare), None = illimitato
+        ttl (float, optional): Età massima in secondi dalla ricezione, None = nessuna scadenza
+    """
+
+    __slots__ = ('max_items', 'ttl')
+
+    def __init__(self, max_items=None, ttl=None):
+        self.max_items = max_items
+        self.ttl = ttl
+
+
+# Limite di default per tipo: evita la crescita illimitata nelle esecuzioni lunghe
+DEFAULT_RETENTION = RetentionPolicy(max_items=10000)
+
+
+class KnowledgeStore(Mapping):
+    """
+    Knowledge base limitata e indicizzata di un agente.
+
+    Conserva i record per tipo di conoscenza secondo una RetentionPolicy e
+    mantiene indici secondari per agente sorgente e per id del payload,
+    oltre a contatori O(1). Come Mapping espone la vista compatibile con la
+    vecchia knowledge_base: store['atom'] restituisce la lista dei record.
+    """
+
+    def __init__(self, default_policy=DEFAULT_RETENTION, id_fields=('id', 'analysis_id')):
+        """
+        Args:
+            default_policy (RetentionPolicy): Politica per i tipi senza politica specifica
+            id_fields (tuple): Campi del payload usati, in ordine, come id per l'indice
+        """
+        self._lock = threading.RLock()
+        self._default_policy = default_policy or RetentionPolicy()
+        self._policies = {}
+        self._id_fields = id_fields
+        self._records = {}     # knowledge_type -> deque di KnowledgeRecord (ordine di arrivo)
+        self._by_source = {}   # source -> {seq: KnowledgeRecord}
+        self._by_id = {}       # id payload -> KnowledgeRecord
+        self._seq = 0
+        self._size = 0
+        self._received = {}    # knowledge_type -> totale ricevuto dall'avvio
+        self._evicted = 0
+        self._cursors = {}     # (consumer, knowledge_type) -> ultimo seq consegnato
+        self._evict_listeners = {}  # consumer -> callback(record) per i record scartati
+
+    # --- Configurazione ---
+    def set_policy(self, knowledge_type, policy):
+        """Imposta la politica di conservazione per un tipo di conoscenza"""
+        with self._lock:
+            self._policies[knowledge_type] = policy
+            self._enforce(knowledge_type, time.time())
+
+    def policy_for(self, knowledge_type):
+        return self._policies.get(knowledge_type, self._default_policy)
+
+    # --- Scrittura ---
+    def add(self, knowledge_type, data, source, timestamp, source_type=None):
+        """
+        Aggiunge un record e applica la politica di conservazione del tipo
+
+        Returns:
+            KnowledgeRecord: Il record inserito
+        """
+        with self._lock:
+            self._seq += 1
+            record = KnowledgeRecord(knowledge_type, data, source, timestamp, source_type, seq=self._seq)
+
+            records = self._records.get(knowledge_type)
+            if records is None:
+                records = self._records[knowledge_type] = deque()
+            records.append(record)
+            self._size += 1
+            self._received[knowledge_type] = self._received.get(knowledge_type, 0) + 1
+
+            self._by_source.setdefault(source, {})[record.seq] = record
+            payload_id = self._payload_id(data)
+            if payload_id is not None:
+                self._by_id[payload_id] = record
+
+            self._enforce(knowledge_type, record.received)
+            return record
+
+    def add_many(self, knowledge_type, items, source, timestamp, source_type=None):
+        """
+        Aggiunge più record dello stesso tipo e mittente (es. un lotto ricevuto)
+
+        Un solo acquisto del lock e una sola applicazione della politica di
+        conservazione per l'intero lotto.
+
+        Returns:
+            list: I record inseriti
+        """
+        if not items:
+            return []
+        with self._lock:
+            records = self._records.get(knowledge_type)
+            if records is None:
+                records = self._records[knowledge_type] = deque()
+            by_source = self._by_source.setdefault(source, {})
+            received = time.time()
+            added = []
+            for data in items:
+                self._seq += 1
+                record = KnowledgeRecord(knowledge_type, data, source, timestamp, source_type,
+                                         received=received, seq=self._seq)
+                records.append(record)
+                by_source[record.seq] = record
+                payload_id = self._payload_id(data)
+                if payload_id is not None:
+                    self._by_id[payload_id] = record
+                added.append(record)
+            self._size += len(added)
+            self._received[knowledge_type] = self._received.get(knowledge_type, 0) + len(added)
+
+            self._enforce(knowledge_type, received)
+            return added
+
+    def _payload_id(self, data):
+        if isinstance(data, dict):
+            for field in self._id_fields:
+                value = data.get(field)
+                if value is not None:
+                    return value
+        return None
+
+    def _enforce(self, knowledge_type, now):
+        records = self._records.get(knowledge_type)
+        if not records:
+            return
+        policy = self.policy_for(knowledge_type)
+        if policy.max_items is not None:
+            while len(records) > policy.max_items:
+                self._evict(records.popleft())
+        if policy.ttl is not None:
+            while records and now - records[0].received > policy.ttl:
+                self._evict(records.popleft())
+
+    def on_evict(self, consumer, callback):
+        """
+        Registra la callback di un consumer per i record scartati dalla politica di conservazione
+
+        La callback è chiamata con il record sotto il lock della store, quindi
+        deve essere rapida e non usare la store; una nuova registrazione
+        dello stesso consumer sostituisce la precedente.
+        """
+        with self._lock:
+            self._evict_listeners[consumer] = callback
+
+    def _evict(self, record):
+        for callback in self._evict_listeners.values():
+            callback(record)
+        self._size -= 1
+        self._evicted += 1
+        by_source = self._by_source.get(record.source)
+        if by_source is not None:
+            by_source.pop(record.seq, None)
+            if not by_source:
+                del self._by_source[record.source]
+        payload_id = self._payload_id(record.data)
+        if payload_id is not None and self._by_id.get(payload_id) is record:
+            del self._by_id[payload_id]
+
+    def expire(self):
+        """Rimuove i record scaduti per TTL in tutti i tipi"""
+        with self._lock:
+            now = time.time()
+            for knowledge_type in list(self._records):
+                self._enforce(knowledge_type, now)
+
+    # --- Interrogazione ---
+    @property
+    def last_seq(self):
+        """Numero di sequenza dell'ultimo record ricevuto"""
+        return self._seq
+
+    def count(self, knowledge_type=None):
+        """Numero di record conservati (per tipo o totale), in O(1)"""
+        if knowledge_type is None:
+            return self._size
+        records = self._records.get(knowledge_type)
+        return len(records) if records else 0
+
+    def counts(self):
+        """Record conservati per ciascun tipo"""
+        with self._lock:
+            return {kt: len(records) for kt, records in self._records.items()}
+
+    def by_source(self, source, knowledge_type=None):
+        """Record ricevuti da un agente sorgente, in ordine di arrivo"""
+        with self._lock:
+            records = list(self._by_source.get(source, {}).values())
+        if knowledge_type is not None:
+            records = [r for r in records if r.knowledge_type == knowledge_type]
+        return records
+
+    def since(self, knowledge_type, seq):
+        """
+        Record del tipo indicato arrivati dopo il numero di sequenza dato
+
+        Il costo è proporzionale ai soli record nuovi: la scansione parte
+        dal fondo del buffer e si ferma al primo record già visto.
+        """
+        with self._lock:
+            records = self._records.get(knowledge_type)
+            if not records or records[-1].seq <= seq:
+                return []
+            new = []
+            for record in reversed(records):
+                if record.seq <= seq:
+                    break
+                new.append(record)
+        new.reverse()
+        return new
+
+    def read_new(self, knowledge_type, consumer='default'):
+        """
+        Change feed: restituisce i record arrivati dall'ultima chiamata dello
+        stesso consumer e avanza il suo cursore in modo atomico.
+
+        I record scartati dalla politica di conservazione prima di essere
+        letti non vengono consegnati.
+        """
+        key = (consumer, knowledge_type)
+        with self._lock:
+            new = self.since(knowledge_type, self._cursors.get(key, 0))
+            if new:
+                self._cursors[key] = new[-1].seq
+        return new
+
+    def get_by_id(self, payload_id):
+        """Record più recente con l'id di payload indicato, o None"""
+        return self._by_id.get(payload_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stored': self._size,
+                'by_type': {kt: len(records) for kt, records in self._records.items()},
+                'received': dict(self._received),
+                'evicted': self._evicted,
+                'sources': len(self._by_source)
+            }
+
+    def to_dict(self):
+        """Esporta la conoscenza nel formato dict-of-lists della knowledge_base originale"""
+        with self._lock:
+            return {kt: [record.to_dict() for record in records]
+                    for kt, records in self._records.items()}
+
+    # --- Persistenza (vedi persistence.py) ---
+    def changes_since(self, seq):
+        """Record conservati di tutti i tipi con numero di sequenza > seq, in ordine di sequenza"""
+        with self._lock:
+            changes = [record for knowledge_type in self._records
+                       for record in self.since(knowledge_type, seq)]
+        changes.sort(key=lambda record: record.seq)
+        return changes
+
+    def export_state(self, since=0):
+        """
+        Record, cursori e ultimo seq letti in modo atomico, per un checkpoint
+
+        Args:
+            since (int): Esporta solo i record con seq > since (0 = stato completo)
+
+        Returns:
+            tuple: (record in ordine di sequenza, cursori {(consumer, tipo): seq}, ultimo seq)
+        """
+        with self._lock:
+            return self.changes_since(since), dict(self._cursors), self._seq
+
+    def load_state(self, records, cursors, last_seq):
+        """
+        Sostituisce il contenuto della store con uno stato salvato
+
+        I record mantengono numero di sequenza, ricezione e metadati, quindi
+        i cursori dei consumer (iter_new) riprendono da dove erano rimasti.
+        Da chiamare prima che l'agente riceva nuovi messaggi.
+
+        Args:
+            records (iterable): KnowledgeRecord in ordine di sequenza
+            cursors (dict): (consumer, tipo) -> ultimo seq consegnato
+            last_seq (int): Ultimo numero di sequenza assegnato
+        """
+        with self._lock:
+            self._records = {}
+            self._by_source = {}
+            self._by_id = {}
+            self._size = 0
+            self._received = {}
+            max_seq = last_seq
+            for record in records:
+                max_seq = max(max_seq, record.seq)
+                records_of_type = self._records.get(record.knowledge_type)
+                if records_of_type is None:
+                    records_of_type = self._records[record.knowledge_type] = deque()
+                records_of_type.append(record)
+                self._size += 1
+                self._received[record.knowledge_type] = self._received.get(record.knowledge_type, 0) + 1
+                self._by_source.setdefault(record.source, {})[record.seq] = record
+                payload_id = self._payload_id(record.data)
+                if payload_id is not None:
+                    self._by_id[payload_id] = record
+            # Uno snapshot più recente di meta.json può contenere seq oltre last_seq
+            self._seq = max_seq
+            self._cursors = dict(cursors)
+            now = time.time()
+            for knowledge_type in list(self._records):
+                self._enforce(knowledge_type, now)
+
+    def drop_cursor(self, consumer):
+        """Dimentica i cursori di un consumer: la prossima read_new riparte dall'inizio"""
+        with self._lock:
+            for key in [key for key in self._cursors if key[0] == consumer]:
+                del self._cursors[key]
+
+    # --- Vista compatibile (Mapping) ---
+    def __getitem__(self, knowledge_type):
+        with self._lock:
+            return list(self._records[knowledge_type])
+
+    def __contains__(self, knowledge_type):
+        return knowledge_type in self._records
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
@@ -0,0 +1,300 @@
+import json
+import mmap
+import os
+import struct
+import time
+
+try:
+    import msgpack
+except ImportError:  # msgpack è opzionale: senza, i record sono serializzati in JSON
+    msgpack = None
+
+from .knowledge_store import KnowledgeRecord
+
+# File di log e di snapshot: MAGIC + versione + codec, poi frame con prefisso di lunghezza
+MAGIC = b'MIAK'
+FORMAT_VERSION = 1
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+_FILE_HEADER = struct.Struct('!4sBB')
+_FRAME_HEADER = struct.Struct('!I')
+
+LOG_FILE = 'log.bin'
+SNAPSHOT_FILE = 'snapshot.bin'
+META_FILE = 'meta.json'
+MANIFEST_FILE = 'manifest.json'
+
+
+class CheckpointError(ValueError):
+    """File di checkpoint mancante, corrotto o di versione non supportata"""
+    pass
+
+
+def _encode_record(record, codec):
+    row = [record.seq, record.knowledge_type, record.source, record.source_type,
+           record.timestamp, record.received, record.data, record.meta]
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(row, use_bin_type=True)
+    return json.dumps(row, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_record(body, codec):
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise CheckpointError("Checkpoint in msgpack ma msgpack non è installato")
+        row = msgpack.unpackb(body, raw=False)
+    else:
+        row = json.loads(bytes(body))
+    seq, knowledge_type, source, source_type, timestamp, received, data, meta = row
+    record = KnowledgeRecord(knowledge_type, data, source, timestamp, source_type, received, seq)
+    record.meta = meta
+    return record
+
+
+def _write_records(stream, records, codec):
+    """Scrive i record come frame e restituisce quanti sono"""
+    count = 0
+    for record in records:
+        body = _encode_record(record, codec)
+        stream.write(_FRAME_HEADER.pack(len(body)))
+        stream.write(body)
+        count += 1
+    return count
+
+
+def _write_json(path, value):
+    """Scrittura atomica: un lettore vede il file vecchio o quello nuovo, mai uno parziale"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(value, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def iter_file(path, end=None):
+    """
+    Record di un file di log o snapshot, letti in streaming da una mappa in memoria
+
+    Il file non viene caricato: ogni frame è decodificato solo quando il
+    generatore arriva a leggerlo.
+
+    Args:
+        path (str): File da leggere
+        end (int, optional): Offset oltre il quale ignorare il file (coda non confermata)
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0 or end == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        if len(view) < _FILE_HEADER.size:
+            raise CheckpointError(f"Header troncato: {path}")
+        magic, version, codec = _FILE_HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CheckpointError(f"Formato non supportato: {path}")
+        limit = len(view) if end is None else min(end, len(view))
+        offset = _FILE_HEADER.size
+        while offset + _FRAME_HEADER.size <= limit:
+            size, = _FRAME_HEADER.unpack_from(view, offset)
+            start = offset + _FRAME_HEADER.size
+            if start + size > limit:
+                break  # frame scritto a metà: non confermato da meta.json
+            yield _decode_record(view[start:start + size], codec)
+            offset = start + size
+
+
+class KnowledgeLog:
+    """
+    Log append-only e snapshot compatti della knowledge base di un agente.
+
+    Ogni checkpoint accoda al log i record arrivati dall'ultimo, poi conferma
+    con una scrittura atomica di meta.json (ultimo seq, lunghezza valida del
+    log, cursori e stato dell'agente): una coda scritta a metà da un crash
+    viene ignorata. Ogni snapshot_every record accodati il contenuto corrente
+    della store, già potato dalla politica di conservazione, diventa uno
+    snapshot e il log riparte vuoto, dopo che meta.json ha confermato lo
+    snapshot. Il ripristino carica lo snapshot e rilegge la coda del log.
+    """
+
+    def __init__(self, directory, agent_id, codec=None):
+        """
+        Args:
+            directory (str): Cartella del checkpoint della società
+            agent_id (str): Agente di cui questo log conserva la conoscenza
+            codec (int, optional): CODEC_JSON o CODEC_MSGPACK (default: msgpack se installato)
+        """
+        self.path = os.path.join(directory, agent_id)
+        self.agent_id = agent_id
+        if codec is None:
+            codec = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+        self.codec = codec
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def read_meta(self):
+        """meta.json dell'ultimo checkpoint, o None se l'agente non ne ha"""
+        path = self._file(META_FILE)
+        return _read_json(path) if os.path.exists(path) else None
+
+    def checkpoint(self, store, state=None, snapshot_every=10000):
+        """
+        Salva in modo incrementale una KnowledgeStore
+
+        Args:
+            store (KnowledgeStore): Knowledge base dell'agente
+            state (dict, optional): Stato dell'agente da ripristinare (vedi BaseAgent.checkpoint_state)
+            snapshot_every (int): Record accodati al log dopo i quali si compatta in uno snapshot
+
+        Returns:
+            int: Record scritti (nel log o nello snapshot)
+        """
+        meta = self.read_meta() or {'last_seq': 0, 'snapshot_seq': 0, 'log_length': 0, 'log_records': 0}
+        compact = meta['log_records'] >= snapshot_every
+        if store.last_seq < meta['last_seq']:
+            # Una store non ripristinata da questo checkpoint ha una numerazione propria:
+            # accodarla al log mescolerebbe due sequenze, quindi si riparte da uno snapshot.
+            # Il vecchio log smette subito di essere confermato, così un crash prima
+            # della fine lascia il vecchio snapshot e non un misto dei due
+            meta.update(log_length=0, log_records=0)
+            _write_json(self._file(META_FILE), meta)
+            compact = True
+        records, cursors, last_seq = store.export_state(0 if compact else meta['last_seq'])
+
+        if compact:
+            written = self._write_snapshot(records)
+            meta.update(snapshot_seq=last_seq, log_length=0, log_records=0)
+        else:
+            # Un log già iniziato mantiene il suo codec
+            codec = meta.get('log_codec', self.codec) if meta['log_length'] else self.codec
+            written = self._append(records, meta['log_length'], codec)
+            if written:
+                meta['log_codec'] = codec
+                meta['log_length'] = os.path.getsize(self._file(LOG_FILE))
+                meta['log_records'] += written
+
+        meta['last_seq'] = last_seq
+        meta['cursors'] = [[consumer, knowledge_type, seq]
+                           for (consumer, knowledge_type), seq in cursors.items()]
+        meta['state'] = state or {}
+        meta['saved'] = time.time()
+        _write_json(self._file(META_FILE), meta)
+        if compact:
+            # Il log è interamente contenuto nello snapshot e meta.json non lo
+            # conferma più (log_length 0): solo ora può ripartire vuoto
+            open(self._file(LOG_FILE), 'wb').close()
+        return written
+
+    def _append(self, records, valid_length, codec):
+        if not records:
+            return 0
+        path = self._file(LOG_FILE)
+        with open(path, 'ab') as f:
+            # Scarta un'eventuale coda non confermata da un checkpoint interrotto
+            if f.tell() > valid_length:
+                f.truncate(valid_length)
+            if valid_length == 0:
+                f.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION, codec))
+            written = _write_records(f, records, codec)
+            f.flush()
+            os.fsync(f.fileno())
+        return written
+
+    def _write_snapshot(self, records):
+        path = self._file(SNAPSHOT_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION, self.codec))
+            written = _write_records(f, records, self.codec)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return written
+
+    def iter_records(self, meta=None):
+        """
+        Record salvati in ordine di sequenza: snapshot, poi coda del log confermata
+
+        I record del log già contenuti nello snapshot sono saltati: se un
+        crash interrompe la compattazione dopo la sostituzione dello snapshot
+        ma prima di meta.json, il log confermato dal vecchio meta.json è
+        ancora presente e i suoi record hanno seq non oltre l'ultimo dello
+        snapshot.
+        """
+        meta = meta or self.read_meta()
+        if meta is None:
+            return
+        last = meta['snapshot_seq']
+        for record in iter_file(self._file(SNAPSHOT_FILE)):
+            last = max(last, record.seq)
+            yield record
+        for record in iter_file(self._file(LOG_FILE), meta['log_length']):
+            if record.seq > last:
+                yield record
+
+    def restore(self, store):
+        """
+        Ricarica nella store la conoscenza salvata
+
+        Returns:
+            dict: Stato dell'agente salvato con l'ultimo checkpoint (vuoto se assente)
+        """
+        meta = self.read_meta()
+        if meta is None:
+            return {}
+        cursors = {(consumer, knowledge_type): seq for consumer, knowledge_type, seq in meta['cursors']}
+        store.load_state(self.iter_records(meta), cursors, meta['last_seq'])
+        return meta.get('state', {})
+
+
+def write_manifest(directory, agents):
+    """Elenco degli agenti del checkpoint, per ricostruire la società"""
+    _write_json(os.path.join(directory, MANIFEST_FILE), {
+        'version': FORMAT_VERSION,
+        'saved': time.time(),
+        'agents': [{'agent_id': agent.agent_id, 'agent_type': agent.agent_type,
+                    'class': type(agent).__name__} for agent in agents]
+    })
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise CheckpointError(f"Nessun checkpoint in {directory}")
+    manifest = _read_json(path)
+    if manifest.get('version') != FORMAT_VERSION:
+        raise CheckpointError(f"Versione di checkpoint non supportata: {manifest.get('version')}")
+    return manifest
+
+
+def iter_checkpoint(directory):
+    """
+    Conoscenza di un checkpoint come coppie (agent_id, KnowledgeRecord), in streaming
+
+    Legge i file salvati senza ricostruire gli agenti né caricare tutto in memoria.
+    """
+    for entry in read_manifest(directory)['agents']:
+        log = KnowledgeLog(directory, entry['agent_id'])
+        for record in log.iter_records():
+            yield entry['agent_id'], record
+
+
+def export_jsonl(directory, stream):
+    """
+    Esporta un checkpoint come JSON Lines, un record per riga
+
+    Returns:
+        int: Record esportati
+    """
+    exported = 0
+    for agent_id, record in iter_checkpoint(directory):
+        line = {'agent_id': agent_id, 'seq': record.seq, 'knowledge_type': record.knowledge_type, **record.to_dict()}
+        stream.write(json.dumps(line) + '\n')
+        exported += 1
+    return exported
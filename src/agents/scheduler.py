@@ -0,0 +1,209 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AgentTimer:
+    """Attività periodica di un agente (es. creazione di un atomo ogni 5 s)"""
+
+    __slots__ = ('interval', 'callback', 'next_due')
+
+    def __init__(self, interval, callback, first_due=None):
+        self.interval = interval
+        self.callback = callback
+        self.next_due = first_due if first_due is not None else time.monotonic() + interval
+
+    def claim(self, now):
+        """Se il timer è scaduto avanza la prossima scadenza e restituisce True"""
+        if now < self.next_due:
+            return False
+        # Se in ritardo di più periodi non recupera le esecuzioni perse
+        self.next_due = max(self.next_due + self.interval, now)
+        return True
+
+    def run_if_due(self, now):
+        """Esegue la callback se scaduta; restituisce True se eseguita"""
+        if not self.claim(now):
+            return False
+        self.callback()
+        return True
+
+
+class TimerWheel:
+    """
+    Timer wheel a hash per scadenze periodiche.
+
+    Inserimento e avanzamento costano O(1) ammortizzato per timer: ogni
+    scadenza è convertita in un numero di tick e collocata nello slot
+    tick % size; a ogni avanzamento si esaminano solo gli slot attraversati.
+    """
+
+    def __init__(self, tick=0.05, size=512):
+        self.tick = tick
+        self.size = size
+        self.slots = [[] for _ in range(size)]
+        self.current_tick = int(time.monotonic() / tick)
+        self._lock = threading.Lock()
+
+    def schedule(self, deadline, item):
+        """Programma item per la scadenza deadline (secondi, time.monotonic)"""
+        with self._lock:
+            ticks = max(math.ceil(deadline / self.tick), self.current_tick + 1)
+            self.slots[ticks % self.size].append((ticks, item))
+
+    def advance(self, now):
+        """Avanza fino a now e restituisce gli item scaduti"""
+        expired = []
+        with self._lock:
+            target = int(now / self.tick)
+            # Oltre un giro completo ogni slot va comunque visitato una sola volta
+            start = max(self.current_tick, target - self.size)
+            for ticks in range(start + 1, target + 1):
+                slot = self.slots[ticks % self.size]
+                if not slot:
+                    continue
+                pending = []
+                for entry in slot:
+                    if entry[0] <= target:
+                        expired.append(entry[1])
+                    else:
+                        pending.append(entry)
+                slot[:] = pending
+            self.current_tick = max(self.current_tick, target)
+        return expired
+
+
+class AgentScheduler:
+    """
+    Scheduler persistente ed event-driven per una società di agenti.
+
+    Un pool fisso di worker esegue agent.step() solo quando un agente ha
+    lavoro: conoscenza appena ricevuta (notifica dal listener) o un timer
+    periodico scaduto (timer wheel). Gli agenti inattivi non occupano worker
+    e ogni agente è eseguito da al più un worker alla volta.
+    """
+
+    def __init__(self, max_workers=8, tick=0.05, wheel_size=512):
+        """
+        Args:
+            max_workers (int): Dimensione del pool di worker, indipendente dal numero di agenti
+            tick (float): Risoluzione in secondi della timer wheel
+            wheel_size (int): Numero di slot della timer wheel
+        """
+        self.max_workers = max_workers
+        self.wheel = TimerWheel(tick, wheel_size)
+        self.executor = None
+        self.running = False
+        self.agents = {}
+        self._busy = set()   # agenti in coda o in esecuzione
+        self._dirty = set()  # agenti notificati mentre erano occupati
+        self._armed = {}     # id(timer) -> scadenza programmata sulla wheel
+        self._lock = threading.Lock()
+        self._clock_thread = None
+        self.stats = {
+            "steps": 0,
+            "wakeups": 0,
+            "timer_fires": 0,
+            "errors": 0
+        }
+
+    def add_agent(self, agent):
+        """Registra un agente: da ora viene risvegliato da eventi e timer"""
+        with self._lock:
+            self.agents[agent.agent_id] = agent
+        agent.wakeup = self.notify
+        self._arm_timers(agent)
+        if self.running and agent.has_pending_work():
+            self.notify(agent)
+
+    def remove_agent(self, agent):
+        with self._lock:
+            self.agents.pop(agent.agent_id, None)
+            for timer in agent.timers:
+                self._armed.pop(id(timer), None)
+        agent.wakeup = None
+
+    def _arm_timers(self, agent):
+        """Programma sulla wheel la prossima scadenza dei timer dell'agente"""
+        for timer in agent.timers:
+            with self._lock:
+                if self._armed.get(id(timer)) == timer.next_due:
+                    continue
+                self._armed[id(timer)] = timer.next_due
+            self.wheel.schedule(timer.next_due, (agent, timer, timer.next_due))
+
+    def start(self):
+        """Avvia il pool di worker e l'orologio della timer wheel"""
+        if self.running:
+            return
+        self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix="mia-scheduler")
+        self._clock_thread = threading.Thread(target=self._run_clock, daemon=True)
+        self._clock_thread.start()
+        # Lavoro già accumulato prima dell'avvio
+        for agent in list(self.agents.values()):
+            if agent.has_pending_work():
+                self.notify(agent)
+
+    def stop(self, wait=True):
+        """Ferma l'orologio e attende (opzionalmente) i worker in corso"""
+        self.running = False
+        if self._clock_thread:
+            self._clock_thread.join(timeout=1)
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+    def notify(self, agent):
+        """Segnala che un agente ha lavoro; è chiamata dai listener e dai timer"""
+        with self._lock:
+            if not self.running or agent.agent_id not in self.agents:
+                return
+            self.stats["wakeups"] += 1
+            if agent.agent_id in self._busy:
+                self._dirty.add(agent.agent_id)
+                return
+            self._busy.add(agent.agent_id)
+            executor = self.executor
+        try:
+            executor.submit(self._run_agent, agent)
+        except RuntimeError:
+            # Pool già chiuso da stop()
+            with self._lock:
+                self._busy.discard(agent.agent_id)
+
+    def _run_agent(self, agent):
+        while True:
+            try:
+                if agent.active:
+                    agent.step()
+                    agent.flush()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Errore nell'agente {agent.agent_id}: {e}")
+            self._arm_timers(agent)
+            with self._lock:
+                self.stats["steps"] += 1
+                if agent.agent_id in self._dirty and self.running:
+                    # Nuovi eventi arrivati durante lo step: riesegui subito
+                    self._dirty.discard(agent.agent_id)
+                    continue
+                self._busy.discard(agent.agent_id)
+                return
+
+    def _run_clock(self):
+        while self.running:
+            time.sleep(self.wheel.tick)
+            for agent, timer, deadline in self.wheel.advance(time.monotonic()):
+                with self._lock:
+                    # Scadenze superate da una riprogrammazione successiva
+                    if self._armed.get(id(timer)) != deadline:
+                        continue
+                    del self._armed[id(timer)]
+                if agent.agent_id not in self.agents or not agent.active:
+                    continue
+                self.stats["timer_fires"] += 1
+                # Il timer viene riarmato da _run_agent dopo l'esecuzione
+                self.notify(agent)
@@ -0,0 +1,271 @@
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .agent_manager import AgentManager, ChemistAgent, PhysicsAgent, print_collective_intelligence
+from .transport import RedisTransport
+
+# Strategie di collocazione degli agenti negli shard
+PLACEMENT_HASH = "hash"  # per agent_id: distribuzione uniforme
+PLACEMENT_TYPE = "type"  # per agent_type: agenti dello stesso tipo nello stesso shard
+
+
+def shard_for(agent_id: str, agent_type: str, num_shards: int, placement: str = PLACEMENT_HASH) -> int:
+    """
+    Shard di destinazione di un agente
+
+    Usa crc32 e non hash(), che in Python è randomizzato per processo:
+    la collocazione deve essere stabile tra coordinatore, worker e riavvii.
+    """
+    key = agent_type if placement == PLACEMENT_TYPE else agent_id
+    return zlib.crc32(key.encode("utf-8")) % num_shards
+
+
+def _shard_main(shard_id: int, specs: List[Tuple], conn, transport_factory: Optional[Callable]) -> None:
+    """Ciclo di un processo worker: costruisce i propri agenti ed esegue i comandi del coordinatore"""
+    manager = AgentManager(transport_factory() if transport_factory else None)
+    for agent_class, agent_id, kwargs in specs:
+        if manager.transport is not None:
+            kwargs = dict(kwargs, transport=manager.transport)
+        manager.add_agent(agent_class(agent_id, **kwargs))
+
+    commands = {
+        "cycle": lambda: (manager.run_single_cycle(), manager.stats)[1],
+        "start_scheduler": lambda max_workers: manager.start_scheduler(max_workers).stats,
+        "stats": lambda: _shard_stats(manager),
+        "summary": manager.knowledge_summary,
+        "knowledge": manager.get_system_knowledge,
+        "metrics": lambda: (shard_id, manager.get_metrics()),
+        "stop": manager.stop,
+    }
+
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            manager.stop()
+            break
+        try:
+            conn.send(("ok", commands[command](*args)))
+        except Exception as e:
+            conn.send(("error", f"shard {shard_id}: {e}"))
+        if command == "stop":
+            break
+    conn.close()
+
+
+def _shard_stats(manager: AgentManager) -> Dict[str, Any]:
+    stats = dict(manager.stats)
+    if manager.scheduler:
+        stats["total_cycles"] = manager.scheduler.stats["steps"]
+    stats["active_agents"] = sum(1 for agent in manager.agents if agent.active)
+    manager.update_message_stats()
+    stats["messages_shared"] = manager.stats["messages_shared"]
+    return stats
+
+
+class ShardedAgentManager:
+    """
+    Società di agenti distribuita su più processi worker.
+
+    Il coordinatore colloca ogni agente in uno shard (per hash dell'agent_id
+    o per tipo), inoltra i comandi di controllo ai worker e riunisce stats,
+    conoscenza e resoconti. Ogni shard ha il proprio GIL, quindi il lavoro
+    CPU-bound in process() scala con i core.
+
+    Gli agenti vengono costruiti nei worker a partire da specifiche
+    (classe, agent_id, kwargs), perché thread e connessioni non sono
+    trasferibili tra processi. Perché la conoscenza fluisca tra shard il
+    trasporto deve essere condiviso tra processi (Redis): con un
+    InProcessTransport ogni shard resta una società isolata.
+    """
+
+    def __init__(self, num_shards: Optional[int] = None, placement: str = PLACEMENT_HASH,
+                 transport_factory: Optional[Callable] = None):
+        """
+        Args:
+            num_shards: Numero di processi worker (default: numero di core)
+            placement: PLACEMENT_HASH o PLACEMENT_TYPE
+            transport_factory: Callable picklable che crea il trasporto di
+                ciascuno shard (es. RedisTransport); None = una connessione
+                Redis per agente, come AgentManager
+        """
+        self.num_shards = num_shards or os.cpu_count() or 1
+        self.placement = placement
+        self.transport_factory = transport_factory
+        self.specs: List[List[Tuple]] = [[] for _ in range(self.num_shards)]
+        self.placements: Dict[str, int] = {}
+        self.processes = []
+        self.connections = []
+        self.running = False
+        self._last_summary: Dict[str, Dict[str, int]] = {}
+        self.stats = {
+            "total_cycles": 0,
+            "active_agents": 0,
+            "messages_shared": 0
+        }
+
+    def add_agent(self, agent_class: type, agent_id: str, agent_type: Optional[str] = None, **kwargs) -> int:
+        """
+        Registra un agente da creare nel suo shard (prima di start())
+
+        Returns:
+            int: Indice dello shard assegnato
+        """
+        if self.processes:
+            raise RuntimeError("Gli agenti vanno aggiunti prima di start()")
+        shard = shard_for(agent_id, agent_type or agent_class.__name__, self.num_shards, self.placement)
+        self.specs[shard].append((agent_class, agent_id, kwargs))
+        self.placements[agent_id] = shard
+        print(f"✅ Aggiunto agente {agent_id} ({agent_type or agent_class.__name__}) allo shard {shard}")
+        return shard
+
+    def create_default_society(self, size: int = 2) -> None:
+        """Crea la società di default, distribuita sugli shard"""
+        for i in range(size):
+            self.add_agent(ChemistAgent, f"ChemistAgent_{i:03d}")
+        for i in range(size):
+            self.add_agent(PhysicsAgent, f"PhysicsAgent_{i:03d}")
+        print(f"🏗️  Società creata con {len(self.placements)} agenti su {self.num_shards} shard")
+
+    def start(self) -> None:
+        """Avvia un processo worker per ogni shard non vuoto"""
+        ctx = multiprocessing.get_context("spawn")
+        for shard_id, specs in enumerate(self.specs):
+            if not specs:
+                continue
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_shard_main, name=f"mia-shard-{shard_id}",
+                                  args=(shard_id, specs, child_conn, self.transport_factory),
+                                  daemon=True)
+            process.start()
+            child_conn.close()
+            self.processes.append(process)
+            self.connections.append(parent_conn)
+        self.running = True
+
+    def _broadcast(self, command: str, *args) -> List[Any]:
+        """Invia un comando a tutti gli shard in parallelo e raccoglie le risposte"""
+        for conn in self.connections:
+            conn.send((command, args))
+        results = []
+        for conn in self.connections:
+            status, value = conn.recv()
+            if status == "error":
+                print(f"❌ Errore nello shard: {value}")
+                continue
+            results.append(value)
+        return results
+
+    def run_single_cycle(self) -> None:
+        """Esegue un ciclo in tutti gli shard in parallelo"""
+        if not self.processes:
+            self.start()
+        self._merge_stats(self._broadcast("cycle"))
+
+    def run_continuous(self, max_cycles: int = 20, cycle_delay: float = 3.0) -> None:
+        """Esegue il sistema sharded a cicli, come AgentManager.run_continuous"""
+        print(f"🚀 Avvio sistema MIA sharded ({self.num_shards} shard) per {max_cycles} cicli...\n")
+        if not self.processes:
+            self.start()
+        try:
+            for cycle in range(max_cycles):
+                if not self.running:
+                    break
+                self.run_single_cycle()
+                self.print_stats()
+                time.sleep(cycle_delay)
+        except KeyboardInterrupt:
+            print("\n⏹️  Sistema fermato dall'utente...")
+        finally:
+            self.stop()
+
+    def run_scheduled(self, duration: float = 60.0, max_workers: int = 8,
+                      stats_interval: float = 5.0) -> None:
+        """Avvia lo scheduler event-driven in ogni shard per duration secondi"""
+        if not self.processes:
+            self.start()
+        self._broadcast("start_scheduler", max_workers)
+        deadline = time.monotonic() + duration
+        try:
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(stats_interval, max(deadline - time.monotonic(), 0)))
+                self._merge_stats(self._broadcast("stats"))
+                self.print_stats()
+        except KeyboardInterrupt:
+            print("\n⏹️  Sistema fermato dall'utente...")
+        finally:
+            self.stop()
+
+    def _merge_stats(self, shard_stats: List[Dict[str, Any]]) -> None:
+        if not shard_stats:
+            return
+        # I cicli procedono in parallelo negli shard: conta il più avanzato
+        self.stats["total_cycles"] = max(stats["total_cycles"] for stats in shard_stats)
+        self.stats["active_agents"] = sum(stats["active_agents"] for stats in shard_stats)
+        self.stats["messages_shared"] = sum(stats["messages_shared"] for stats in shard_stats)
+
+    def knowledge_summary(self) -> Dict[str, Dict[str, int]]:
+        summary = {}
+        for shard_summary in self._broadcast("summary"):
+            summary.update(shard_summary)
+        return summary
+
+    def get_system_knowledge(self) -> Dict[str, Any]:
+        """Raccoglie e unisce la conoscenza di tutti gli shard"""
+        system_knowledge = {}
+        for shard_knowledge in self._broadcast("knowledge"):
+            system_knowledge.update(shard_knowledge)
+        return system_knowledge
+
+    def get_metrics(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Metriche di tutti gli shard, con l'etichetta shard su ogni campione"""
+        metrics: Dict[str, List[Dict[str, Any]]] = {}
+        for shard_id, shard_metrics in self._broadcast("metrics"):
+            for name, samples in shard_metrics.items():
+                for sample in samples:
+                    sample["labels"]["shard"] = str(shard_id)
+                metrics.setdefault(name, []).extend(samples)
+        return metrics
+
+    def print_stats(self) -> None:
+        print(f"\n📊 Stats: Cicli={self.stats['total_cycles']}, "
+              f"Agenti_Attivi={self.stats['active_agents']}, Messaggi={self.stats['messages_shared']}, "
+              f"Shard={len(self.connections)}")
+        for agent_id, counts in self.knowledge_summary().items():
+            print(f"   🤖 {agent_id} [shard {self.placements.get(agent_id)}]: "
+                  f"KB={sum(counts.values())} elementi")
+
+    def demonstrate_collective_intelligence(self) -> None:
+        """Resoconto finale unito di tutti gli shard (anche dopo stop())"""
+        summary = self.knowledge_summary() if self.connections else self._last_summary
+        print_collective_intelligence(summary)
+
+    def stop(self) -> None:
+        """Ferma gli agenti in tutti gli shard, conservandone il resoconto finale"""
+        self.running = False
+        if self.connections:
+            self._last_summary = self.knowledge_summary()
+            self._broadcast("stop")
+        for conn in self.connections:
+            conn.close()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.connections = []
+        self.processes = []
+        print("🛑 Sistema MIA sharded fermato.")
+
+
+if __name__ == "__main__":
+    print("🌟 MIA - Meta-Intelligence Agent Framework (sharded)")
+    print("=" * 50)
+
+    manager = ShardedAgentManager(transport_factory=RedisTransport)
+    manager.create_default_society(size=int(sys.argv[1]) if len(sys.argv) > 1 else 2)
+    manager.run_continuous(max_cycles=15, cycle_delay=4.0)
+    manager.demonstrate_collective_intelligence()
@@ -0,0 +1,379 @@
+import fnmatch
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import redis
+
+from . import envelope
+
+
+def topic_channel(broadcast_channel, knowledge_type):
+    """Canale broadcast dedicato a un tipo di conoscenza (es. mia_broadcast:atom)"""
+    return f"{broadcast_channel}:{knowledge_type}"
+
+
+class Subscription(ABC):
+    """Sottoscrizione di un agente a uno o più canali del trasporto"""
+
+    @abstractmethod
+    def listen(self):
+        """Generatore bloccante dei messaggi ricevuti (envelope già decodificati)"""
+        pass
+
+    @abstractmethod
+    def close(self):
+        """Chiude la sottoscrizione e sblocca listen()"""
+        pass
+
+    def pending(self):
+        """Messaggi ricevuti e non ancora consegnati a listen(), None se non misurabile"""
+        return None
+
+
+class Transport(ABC):
+    """
+    Interfaccia di comunicazione tra agenti.
+
+    Un trasporto pubblica envelope (dict) su canali nominati e consegna
+    ai sottoscrittori gli stessi envelope. La serializzazione è un dettaglio
+    del singolo backend.
+    """
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """
+        Pubblica un envelope su un canale
+
+        Args:
+            channel (str): Nome del canale
+            message (dict): Envelope del messaggio
+
+        Returns:
+            int: Numero di sottoscrittori raggiunti (se noto)
+        """
+        pass
+
+    @abstractmethod
+    def subscribe(self, *channels, patterns=(), consumer=None, ignore_sender=None):
+        """
+        Crea una Subscription sui canali indicati
+
+        Args:
+            patterns (tuple): Pattern glob di canali (es. "mia_broadcast:*"), come PSUBSCRIBE
+            consumer (str, optional): Identità stabile del sottoscrittore (es. agent_id),
+                usata dai trasporti persistenti per riprendere dopo un riavvio
+            ignore_sender (str, optional): Mittente i cui envelope vengono scartati
+                prima della decodifica (di solito il sottoscrittore stesso)
+        """
+        pass
+
+    def publish_batch(self, messages):
+        """
+        Pubblica una sequenza di envelope, nell'ordine dato
+
+        Args:
+            messages (list): Coppie (channel, message)
+
+        Returns:
+            int: Numero di envelope pubblicati
+        """
+        for channel, message in messages:
+            self.publish(channel, message)
+        return len(messages)
+
+    def close(self):
+        """Rilascia le risorse del trasporto"""
+        pass
+
+
+class RedisSubscription(Subscription):
+    def __init__(self, pubsub, ignore_sender=None):
+        self.pubsub = pubsub
+        self.closed = False
+        self.is_ignored = envelope.sender_filter(ignore_sender) if ignore_sender else None
+
+    def listen(self):
+        for message in self.pubsub.listen():
+            if self.closed:
+                break
+            if message['type'] not in ('message', 'pmessage'):
+                continue
+            if self.is_ignored and self.is_ignored(message['data']):
+                continue
+            try:
+                yield envelope.decode(message['data'])
+            except envelope.EnvelopeError:
+                # Segnalato al chiamante come envelope nullo
+                yield None
+
+    def close(self):
+        self.closed = True
+        try:
+            self.pubsub.close()
+        except Exception:
+            pass
+
+
+class RedisTransport(Transport):
+    """
+    Trasporto su Redis pub/sub.
+
+    Gli envelope sono serializzati in JSON (legacy) o nel formato binario
+    versionato di envelope.py, a seconda di wire_format. In ricezione il
+    formato è riconosciuto messaggio per messaggio, quindi agenti con
+    wire_format diversi possono convivere durante la migrazione.
+    """
+
+    def __init__(self, host='localhost', port=6379, client=None, wire_format=envelope.WIRE_JSON):
+        # I payload binari richiedono un client con decode_responses=False
+        self.client = client or redis.Redis(host=host, port=port)
+        self.client.ping()  # Solleva redis.ConnectionError se Redis non è raggiungibile
+        self.wire_format = wire_format
+
+    def publish(self, channel, message):
+        return self.client.publish(channel, envelope.encode(message, self.wire_format))
+
+    def publish_batch(self, messages):
+        # Un solo round trip per l'intero lotto
+        pipe = self.client.pipeline(transaction=False)
+        for channel, message in messages:
+            pipe.publish(channel, envelope.encode(message, self.wire_format))
+        pipe.execute()
+        return len(messages)
+
+    def subscribe(self, *channels, patterns=(), consumer=None, ignore_sender=None):
+        pubsub = self.client.pubsub()
+        if channels:
+            pubsub.subscribe(*channels)
+        if patterns:
+            pubsub.psubscribe(*patterns)
+        return RedisSubscription(pubsub, ignore_sender)
+
+    def close(self):
+        self.client.close()
+
+
+class RedisStreamSubscription(Subscription):
+    """
+    Lettura di un consumer group da uno o più stream Redis.
+
+    I messaggi arrivano a lotti (XREADGROUP con COUNT e BLOCK) e un lotto
+    viene confermato con XACK solo quando listen() viene ripreso dopo
+    l'ultimo messaggio, cioè dopo che il chiamante li ha elaborati tutti.
+    All'avvio vengono riconsegnati i messaggi letti e non confermati da
+    una sessione precedente dello stesso consumer.
+    """
+
+    def __init__(self, client, streams, group, consumer, batch_size, block_ms, ignore_sender=None):
+        self.client = client
+        self.streams = streams
+        self.group = group
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.closed = False
+        self.is_ignored = envelope.sender_filter(ignore_sender) if ignore_sender else None
+
+    def _read(self, positions, block):
+        response = self.client.xreadgroup(self.group, self.consumer, positions,
+                                          count=self.batch_size, block=block)
+        return [(stream, entries) for stream, entries in response or () if entries]
+
+    def listen(self):
+        # Prima i messaggi pendenti di questo consumer (id "0"): sono confermati
+        # man mano, quindi si rilegge da "0" finché non restano vuoti; poi i nuovi (">")
+        recovering = True
+        positions = {stream: '0' for stream in self.streams}
+        while not self.closed:
+            started = time.monotonic()
+            try:
+                batch = self._read(positions, None if recovering else self.block_ms)
+            except redis.ConnectionError:
+                if self.closed:
+                    break
+                raise
+            if not batch:
+                if recovering:
+                    recovering = False
+                    positions = {stream: '>' for stream in self.streams}
+                elif time.monotonic() - started < self.block_ms / 2000:
+                    # Server (o stand-in) che non rispetta BLOCK: evita un ciclo attivo
+                    time.sleep(self.block_ms / 1000)
+                continue
+
+            for stream, entries in batch:
+                for entry_id, fields in entries:
+                    if self.is_ignored and self.is_ignored(fields.get(b'e', b'')):
+                        continue
+                    try:
+                        yield envelope.decode(fields[b'e'])
+                    except (envelope.EnvelopeError, KeyError):
+                        yield None
+                    if self.closed:
+                        return
+                # Lotto elaborato: conferma in un solo comando per stream
+                self.client.xack(stream, self.group, *(entry_id for entry_id, _ in entries))
+
+    def close(self):
+        self.closed = True
+
+
+class RedisStreamTransport(Transport):
+    """
+    Trasporto su Redis Streams con un consumer group per sottoscrittore.
+
+    Ogni canale è uno stream (stream_prefix + canale) scritto con XADD e
+    limitato a circa maxlen voci. Ogni agente legge con il proprio consumer
+    group, quindi riceve tutto lo storico conservato anche se si avvia o si
+    riconnette in ritardo, e nulla va perso finché non viene confermato.
+    """
+
+    def __init__(self, host='localhost', port=6379, client=None, wire_format=envelope.WIRE_JSON,
+                 stream_prefix='mia_stream:', maxlen=10000, batch_size=100, block_ms=1000,
+                 start_id='0'):
+        """
+        Args:
+            maxlen (int, optional): Lunghezza approssimata a cui vengono tagliati gli stream (None = illimitata)
+            batch_size (int): Messaggi massimi per lettura
+            block_ms (int): Attesa massima di una lettura bloccante, in millisecondi
+            start_id (str): Da dove legge un consumer group nuovo: "0" tutto lo storico, "$" solo i nuovi
+        """
+        self.client = client or redis.Redis(host=host, port=port)
+        self.client.ping()
+        self.wire_format = wire_format
+        self.stream_prefix = stream_prefix
+        self.maxlen = maxlen
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.start_id = start_id
+
+    def stream_for(self, channel):
+        return f"{self.stream_prefix}{channel}"
+
+    def publish(self, channel, message):
+        self.client.xadd(self.stream_for(channel), {'e': envelope.encode(message, self.wire_format)},
+                         maxlen=self.maxlen, approximate=True)
+        return 1
+
+    def publish_batch(self, messages):
+        pipe = self.client.pipeline(transaction=False)
+        for channel, message in messages:
+            pipe.xadd(self.stream_for(channel), {'e': envelope.encode(message, self.wire_format)},
+                      maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+        return len(messages)
+
+    def subscribe(self, *channels, patterns=(), consumer=None, ignore_sender=None):
+        """
+        Args:
+            consumer (str): Nome del consumer group (e del consumer); senza un
+                nome stabile ogni sottoscrizione riparte da start_id
+
+        Raises:
+            ValueError: Se vengono chiesti pattern: gli stream vanno nominati
+                uno per uno (gli agenti devono dichiarare interests espliciti)
+        """
+        if patterns:
+            raise ValueError(f"Redis Streams non supporta sottoscrizioni a pattern: {patterns}")
+        group = consumer or f"anonymous-{id(self):x}-{time.monotonic_ns()}"
+        streams = [self.stream_for(channel) for channel in channels]
+        for stream in streams:
+            try:
+                self.client.xgroup_create(stream, group, id=self.start_id, mkstream=True)
+            except redis.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+        return RedisStreamSubscription(self.client, streams, group, group,
+                                       self.batch_size, self.block_ms, ignore_sender)
+
+    def close(self):
+        self.client.close()
+
+
+class InProcessSubscription(Subscription):
+    _CLOSED = object()
+
+    def __init__(self, transport, channels, patterns=(), ignore_sender=None):
+        self.transport = transport
+        self.channels = channels
+        self.patterns = patterns
+        self.ignore_sender = ignore_sender
+        self.queue = queue.SimpleQueue()
+
+    def listen(self):
+        while True:
+            message = self.queue.get()
+            if message is self._CLOSED:
+                break
+            yield message
+
+    def close(self):
+        self.transport._unregister(self)
+        self.queue.put(self._CLOSED)
+
+    def pending(self):
+        return self.queue.qsize()
+
+
+class InProcessTransport(Transport):
+    """
+    Trasporto in memoria per società di agenti nello stesso processo.
+
+    Gli envelope vengono consegnati come oggetti Python, senza copia né
+    serializzazione, in una coda per ciascun sottoscrittore: i riceventi
+    devono trattarli come dati in sola lettura. I messaggi di un mittente
+    non entrano nemmeno nella coda della sua sottoscrizione (ignore_sender).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # canale -> tuple di code (copy-on-write, letta senza lock in publish)
+        self._subscribers = {}
+        self._pattern_subscribers = ()  # sottoscrizioni con almeno un pattern
+        # canale -> destinatari risolti (esatti + pattern), invalidato a ogni (dis)iscrizione
+        self._routes = {}
+
+    def _resolve(self, channel):
+        with self._lock:
+            routes = self._routes.get(channel)
+            if routes is None:
+                exact = self._subscribers.get(channel, ())
+                matched = tuple(s for s in self._pattern_subscribers if s not in exact and
+                                any(fnmatch.fnmatchcase(channel, pattern) for pattern in s.patterns))
+                routes = self._routes[channel] = exact + matched
+            return routes
+
+    def publish(self, channel, message):
+        routes = self._routes.get(channel)
+        if routes is None:
+            routes = self._resolve(channel)
+        sender = message['sender']
+        delivered = 0
+        for subscription in routes:
+            if subscription.ignore_sender != sender:
+                subscription.queue.put(message)
+                delivered += 1
+        return delivered
+
+    def subscribe(self, *channels, patterns=(), consumer=None, ignore_sender=None):
+        subscription = InProcessSubscription(self, channels, patterns, ignore_sender)
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel] = self._subscribers.get(channel, ()) + (subscription,)
+            if patterns:
+                self._pattern_subscribers += (subscription,)
+            self._routes = {}
+        return subscription
+
+    def _unregister(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                remaining = tuple(s for s in self._subscribers.get(channel, ()) if s is not subscription)
+                if remaining:
+                    self._subscribers[channel] = remaining
+                else:
+                    self._subscribers.pop(channel, None)
+            self._pattern_subscribers = tuple(s for s in self._pattern_subscribers if s is not subscription)
+            self._routes = {}
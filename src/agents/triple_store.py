@@ -0,0 +1,434 @@
+import contextlib
+import functools
+import gc
+import hashlib
+import json
+import logging
+import threading
+from collections import deque
+
+# Termine che corrisponde a qualsiasi valore senza legarlo (come '_ in mia.inference)
+WILDCARD = '_'
+
+_ANY = object()
+
+logger = logging.getLogger(__name__)
+
+
+def is_variable(term):
+    """True per i termini '?nome', che vengono legati nelle query con join"""
+    return isinstance(term, str) and term.startswith('?') and len(term) > 1
+
+
+def hashable(value):
+    """
+    Forma hashable di un valore, usabile come chiave degli indici
+
+    Liste e tuple diventano tuple, i set frozenset, i dict e gli altri
+    oggetti non hashable la loro serializzazione JSON (chiavi ordinate).
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(hashable(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True, default=str)
+    try:
+        hash(value)
+    except TypeError:
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+def flatten(data, prefix=''):
+    """
+    Coppie (attributo, valore) di un payload annidato
+
+    I dict annidati diventano attributi con percorso puntato
+    ('properties.mass'); le liste diventano un valore per elemento.
+    I valori non hashable (anche dentro le liste) sono convertiti con hashable().
+    """
+    for key, value in data.items():
+        attribute = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, attribute + '.')
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            for item in value:
+                yield attribute, hashable(item)
+        else:
+            yield attribute, hashable(value)
+
+
+class TripleStore:
+    """
+    Store entità-attributo-valore della conoscenza di sistema.
+
+    Ogni fatto (e, a, v) è indicizzato tre volte con hash annidati:
+    EAV (e -> a -> valori), AEV (a -> e -> valori) e VAE (v -> a -> entità),
+    così un pattern con almeno una posizione nota costa quanto il suo
+    risultato invece di una scansione di tutti i fatti. Le query con più
+    pattern e variabili '?x' vengono risolte come join, scegliendo a ogni
+    passo il pattern più selettivo con i legami correnti.
+
+    I record delle knowledge base degli agenti diventano entità: l'id del
+    payload (o un hash del contenuto) è l'entità, i metadati (knowledge_type,
+    source, source_type, timestamp) e i campi del payload gli attributi.
+    Un'entità importata da ingest() viene ritrattata quando tutti i record
+    che la contengono sono stati scartati dalle rispettive store.
+    """
+
+    def __init__(self, id_fields=('id', 'analysis_id')):
+        """
+        Args:
+            id_fields (tuple): Campi del payload usati, in ordine, come entità dei record
+        """
+        self.id_fields = id_fields
+        self._eav = {}  # entità -> attributo -> set di valori
+        self._aev = {}  # attributo -> entità -> set di valori
+        self._vae = {}  # valore -> attributo -> set di entità
+        self._size = 0
+        self._holders = {}       # entità -> (id store, seq) dei record importati che la contengono
+        self._ingested = {}      # id store -> ultimo seq della store al momento dell'ultimo ingest
+        self._evicted = deque()  # (id store, record) scartati dalle store, da ritrattare
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, triple):
+        entity, attribute, value = triple
+        return value in self._eav.get(entity, {}).get(attribute, ())
+
+    # --- Scrittura ---
+    def add(self, entity, attribute, value):
+        """
+        Aggiunge un fatto (i duplicati sono ignorati)
+
+        Returns:
+            bool: True se il fatto è nuovo
+        """
+        with self._lock:
+            values = self._eav.setdefault(entity, {}).setdefault(attribute, set())
+            if value in values:
+                return False
+            values.add(value)
+            self._aev.setdefault(attribute, {}).setdefault(entity, set()).add(value)
+            self._vae.setdefault(value, {}).setdefault(attribute, set()).add(entity)
+            self._size += 1
+            return True
+
+    def remove(self, entity, attribute, value):
+        """Rimuove un fatto, restituisce True se era presente"""
+        with self._lock:
+            values = self._eav.get(entity, {}).get(attribute)
+            if not values or value not in values:
+                return False
+            _discard(self._eav, entity, attribute, value)
+            _discard(self._aev, attribute, entity, value)
+            _discard(self._vae, value, attribute, entity)
+            self._size -= 1
+            return True
+
+    def retract(self, entity):
+        """Rimuove tutti i fatti di un'entità e restituisce quanti erano"""
+        with self._lock:
+            facts = [(entity, attribute, value)
+                     for attribute, values in self._eav.get(entity, {}).items() for value in values]
+            for fact in facts:
+                self.remove(*fact)
+            return len(facts)
+
+    def add_record(self, record, holder=None):
+        """
+        Aggiunge un KnowledgeRecord come entità
+
+        Args:
+            record (KnowledgeRecord): Record da aggiungere
+            holder (tuple, optional): (id store, seq) del record, per ritrattare l'entità
+                quando tutti i suoi record sono scartati
+
+        Returns:
+            int: Fatti nuovi aggiunti
+        """
+        entity = self.entity_for(record)
+        facts = [('knowledge_type', record.knowledge_type), ('source', record.source),
+                 ('timestamp', record.timestamp)]
+        if record.source_type is not None:
+            facts.append(('source_type', record.source_type))
+        if isinstance(record.data, dict):
+            facts.extend(flatten(record.data))
+        else:
+            facts.append(('value', hashable(record.data)))
+        with self._lock:
+            if holder is not None:
+                self._holders.setdefault(entity, set()).add(holder)
+            by_attribute = self._eav.setdefault(entity, {})
+            added = 0
+            for attribute, value in facts:
+                values = by_attribute.get(attribute)
+                if values is None:
+                    values = by_attribute[attribute] = set()
+                elif value in values:
+                    continue
+                values.add(value)
+                self._aev.setdefault(attribute, {}).setdefault(entity, set()).add(value)
+                self._vae.setdefault(value, {}).setdefault(attribute, set()).add(entity)
+                added += 1
+            self._size += added
+            return added
+
+    def entity_for(self, record):
+        """Entità di un record: il suo id di payload o, in mancanza, un hash del contenuto"""
+        data = record.data
+        if isinstance(data, dict):
+            for field in self.id_fields:
+                value = data.get(field)
+                if value is not None:
+                    return hashable(value)
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return f"{record.source}:{record.knowledge_type}:{digest[:16]}"
+
+    def ingest(self, store, consumer='triple_store', pause_gc=False):
+        """
+        Importa i record arrivati in una KnowledgeStore dall'ultima chiamata
+
+        Usa il change feed della store (read_new) con un cursore proprio,
+        quindi ogni record viene letto una sola volta. Lo stesso messaggio
+        ricevuto da più agenti produce gli stessi fatti, che non si duplicano.
+        I record che la store ha scartato nel frattempo vengono ritrattati;
+        un record che non si riesce a indicizzare è saltato con un warning
+        senza perdere il resto del lotto.
+
+        Args:
+            store (KnowledgeStore): Knowledge base di un agente
+            consumer (str): Nome del cursore nella store
+            pause_gc (bool): Sospende la GC ciclica dell'intero processo durante
+                l'import (utile solo per caricamenti massivi a processo fermo)
+
+        Returns:
+            int: Record importati
+        """
+        key = id(store)
+        store.on_evict(consumer, functools.partial(self._on_evict, key))
+        # I record scartati da qui in poi possono essere già nel triple store
+        self._ingested[key] = store.last_seq
+        imported = 0
+        for knowledge_type in list(store):
+            records = store.read_new(knowledge_type, consumer)
+            if not records:
+                continue
+            with self._lock, (_gc_paused() if pause_gc else contextlib.nullcontext()):
+                for record in records:
+                    try:
+                        self.add_record(record, (key, record.seq))
+                    except Exception as e:
+                        logger.warning("Record %s #%d non indicizzato: %s", knowledge_type, record.seq, e)
+                        continue
+                    imported += 1
+        with self._lock:
+            self._retract_evicted()
+        return imported
+
+    def _on_evict(self, key, record):
+        # Chiamata sotto il lock della store: solo un accodamento, la ritrattazione avviene in ingest
+        if record.seq <= self._ingested.get(key, 0):
+            self._evicted.append((key, record))
+
+    def _retract_evicted(self):
+        while self._evicted:
+            key, record = self._evicted.popleft()
+            entity = self.entity_for(record)
+            holders = self._holders.get(entity)
+            if holders is None:
+                continue
+            holders.discard((key, record.seq))
+            if not holders:
+                del self._holders[entity]
+                self.retract(entity)
+
+    # --- Interrogazione ---
+    def match(self, entity=WILDCARD, attribute=WILDCARD, value=WILDCARD):
+        """
+        Fatti che corrispondono a un pattern (e, a, v)
+
+        '_' e le variabili '?x' corrispondono a qualsiasi valore.
+
+        Returns:
+            list: Tuple (entità, attributo, valore)
+        """
+        terms = tuple(_ANY if term == WILDCARD or is_variable(term) else term
+                      for term in (entity, attribute, value))
+        with self._lock:
+            return list(self._match(*terms))
+
+    def query(self, *patterns):
+        """
+        Risolve una congiunzione di pattern (e, a, v) con variabili condivise
+
+        Esempio, tutte le analisi dell'ossigeno prodotte da agenti fisici:
+            store.query(('?a', 'knowledge_type', 'analysis'),
+                        ('?a', 'element', 'O'),
+                        ('?a', 'source_type', 'PhysicsAgent'))
+
+        Returns:
+            list: Un dict variabile -> valore per ogni soluzione
+        """
+        results = []
+        with self._lock:
+            self._solve(list(patterns), {}, results)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'facts': self._size,
+                'entities': len(self._eav),
+                'attributes': len(self._aev),
+                'values': len(self._vae)
+            }
+
+    def _match(self, entity, attribute, value):
+        if entity is not _ANY:
+            by_attribute = self._eav.get(entity)
+            if not by_attribute:
+                return
+            if attribute is not _ANY:
+                values = by_attribute.get(attribute, ())
+                if value is _ANY:
+                    for found in values:
+                        yield entity, attribute, found
+                elif value in values:
+                    yield entity, attribute, value
+                return
+            for found_attribute, values in by_attribute.items():
+                if value is _ANY:
+                    for found in values:
+                        yield entity, found_attribute, found
+                elif value in values:
+                    yield entity, found_attribute, value
+        elif value is not _ANY:
+            by_attribute = self._vae.get(value)
+            if not by_attribute:
+                return
+            if attribute is not _ANY:
+                for found in by_attribute.get(attribute, ()):
+                    yield found, attribute, value
+                return
+            for found_attribute, entities in by_attribute.items():
+                for found in entities:
+                    yield found, found_attribute, value
+        elif attribute is not _ANY:
+            for found, values in self._aev.get(attribute, {}).items():
+                for found_value in values:
+                    yield found, attribute, found_value
+        else:
+            for found, by_attribute in self._eav.items():
+                for found_attribute, values in by_attribute.items():
+                    for found_value in values:
+                        yield found, found_attribute, found_value
+
+    def _estimate(self, entity, attribute, value):
+        """Stima (per eccesso) dei fatti che corrispondono, letta dalle dimensioni degli indici"""
+        if entity is not _ANY:
+            by_attribute = self._eav.get(entity, {})
+            if attribute is not _ANY:
+                return len(by_attribute.get(attribute, ()))
+            return sum(len(values) for values in by_attribute.values())
+        if value is not _ANY:
+            by_attribute = self._vae.get(value, {})
+            if attribute is not _ANY:
+                return len(by_attribute.get(attribute, ()))
+            return sum(len(entities) for entities in by_attribute.values())
+        if attribute is not _ANY:
+            return len(self._aev.get(attribute, ()))
+        return self._size
+
+    def _solve(self, patterns, bindings, results):
+        if not patterns:
+            results.append(dict(bindings))
+            return
+        resolved = [_resolve(pattern, bindings) for pattern in patterns]
+        
+        # Più pattern (?x, attributo, valore) sulla stessa variabile libera: le entità
+        # candidate sono l'intersezione dei set dell'indice VAE, senza join riga per riga
+        stars = {}
+        for i, (pattern, terms) in enumerate(zip(patterns, resolved)):
+            if terms[0] is _ANY and is_variable(pattern[0]) and terms[1] is not _ANY and terms[2] is not _ANY:
+                stars.setdefault(pattern[0], []).append(i)
+        star = max(stars.items(), key=lambda item: len(item[1]), default=None)
+        if star and len(star[1]) > 1:
+            variable, members = star
+            sets = sorted((self._vae.get(resolved[i][2], {}).get(resolved[i][1], set()) for i in members), key=len)
+            candidates = sets[0].intersection(*sets[1:])
+            rest = [pattern for i, pattern in enumerate(patterns) if i not in members]
+            # La stessa variabile anche come attributo o valore va ricontrollata
+            recheck = any(variable in patterns[i][1:] for i in members)
+            for entity in candidates:
+                extended = dict(bindings)
+                extended[variable] = entity
+                if recheck and any(_unify(patterns[i], (entity, *resolved[i][1:]), extended) is None
+                                   for i in members):
+                    continue
+                if rest:
+                    self._solve(rest, extended, results)
+                else:
+                    results.append(extended)
+            return
+        
+        # Il pattern più selettivo con i legami correnti: il join resta proporzionale al risultato
+        index = min(range(len(patterns)), key=lambda i: self._estimate(*resolved[i]))
+        pattern, rest = patterns[index], patterns[:index] + patterns[index + 1:]
+        for fact in self._match(*resolved[index]):
+            extended = _unify(pattern, fact, bindings)
+            if extended is not None:
+                self._solve(rest, extended, results)
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """
+    Sospende la GC ciclica durante un caricamento massivo
+
+    Gli indici creano milioni di dict e set senza cicli: la GC li
+    riscansionerebbe a ogni raccolta senza liberare nulla (oltre metà del
+    tempo di ingest su qualche centinaio di migliaia di record).
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _discard(index, outer, inner, item):
+    by_inner = index[outer]
+    items = by_inner[inner]
+    items.discard(item)
+    if not items:
+        del by_inner[inner]
+        if not by_inner:
+            del index[outer]
+
+
+def _resolve(pattern, bindings):
+    """Pattern con le variabili già legate sostituite dal loro valore e il resto come _ANY"""
+    return tuple(bindings.get(term, _ANY) if is_variable(term) else _ANY if term == WILDCARD else term
+                 for term in pattern)
+
+
+def _unify(pattern, fact, bindings):
+    """Legami estesi con le variabili del pattern, o None se il fatto li contraddice"""
+    extended = bindings
+    for term, value in zip(pattern, fact):
+        if not is_variable(term):
+            continue
+        bound = extended.get(term, _ANY)
+        if bound is _ANY:
+            if extended is bindings:
+                extended = dict(bindings)
+            extended[term] = value
+        elif bound != value:
+            return None
+    return extended
@@ -0,0 +1,268 @@
+"""
+Suite di benchmark offline di MIA.
+
+Misura, senza Redis né JVM reali:
+- share -> on_knowledge_received: throughput e latenze p50/p99 con N agenti
+  (InProcessTransport e, se installato, RedisTransport su fakeredis)
+- overhead di AgentManager.run_single_cycle al crescere degli agenti
+- round trip e scalabilità con la concorrenza di ClojureBridge, contro il
+  kernel stub di benchmarks/stub_kernel.py (protocolli stdio e socket)
+
+I risultati sono scritti in JSON, con il commit git corrente, per poter
+confrontare le regressioni tra commit.
+
+Uso (dalla cartella src):
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --only bridge
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import wait
+from pathlib import Path
+
+from agents.agent_manager import AgentManager
+from agents.base_agent import BaseAgent
+from agents.transport import InProcessTransport, RedisTransport
+from mia.bridge import ClojureBridge, PROTOCOL_SOCKET, PROTOCOL_STDIO
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+STUB_KERNEL = Path(__file__).resolve().parent / "stub_kernel.py"
+
+
+def summarize(samples):
+    """Statistiche di una serie di durate in secondi, riportate in millisecondi"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silenzia le print degli agenti: misurano il sistema, non il terminale"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class BenchAgent(BaseAgent):
+    """Agente che registra la latenza di consegna di ogni messaggio ricevuto"""
+
+    def __init__(self, agent_id, transport, expected=0, done=None):
+        super().__init__(agent_id, "BenchAgent", transport)
+        self.latencies = []
+        self.expected = expected
+        self.done = done
+
+    def on_knowledge_received(self, knowledge_type, data, sender):
+        self.latencies.append(time.perf_counter() - data["t0"])
+        if len(self.latencies) == self.expected and self.done:
+            self.done.release()
+
+    def process(self):
+        pass
+
+    def get_capabilities(self):
+        return []
+
+
+def make_transport(name):
+    if name == "in-process":
+        return InProcessTransport()
+    return RedisTransport(client=fakeredis.FakeRedis())
+
+
+def bench_share(transport_name, num_agents, messages, timeout=60.0):
+    """Un agente invia messages broadcast, gli altri num_agents-1 li ricevono"""
+    transport = make_transport(transport_name)
+    done = threading.Semaphore(0)
+    with quiet():
+        agents = [BenchAgent(f"bench_{i:04d}", transport, messages, done) for i in range(num_agents)]
+        sender, receivers = agents[0], agents[1:]
+        started = time.perf_counter()
+        for index in range(messages):
+            sender.share("bench", {"index": index, "t0": time.perf_counter()})
+        completed = all(done.acquire(timeout=max(started + timeout - time.perf_counter(), 0))
+                        for _ in receivers)
+        elapsed = time.perf_counter() - started
+        for agent in agents:
+            agent.stop()
+        transport.close()
+
+    latencies = [latency for agent in receivers for latency in agent.latencies]
+    return {
+        "transport": transport_name,
+        "agents": num_agents,
+        "messages": messages,
+        "deliveries": len(latencies),
+        "completed": completed,
+        "elapsed_s": elapsed,
+        "deliveries_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies)
+    }
+
+
+def bench_cycle(num_agents, cycles):
+    """Costo di run_single_cycle per una società di agenti inattivi"""
+    transport = InProcessTransport()
+    with quiet():
+        manager = AgentManager(transport)
+        for i in range(num_agents):
+            manager.add_agent(BenchAgent(f"idle_{i:04d}", transport))
+        manager.run_single_cycle()  # riscaldamento: crea il pool di worker
+        durations = []
+        for _ in range(cycles):
+            started = time.perf_counter()
+            manager.run_single_cycle()
+            durations.append(time.perf_counter() - started)
+        manager.stop()
+
+    cycle = summarize(durations)
+    return {
+        "agents": num_agents,
+        "cycles": cycles,
+        "cycle": cycle,
+        "per_agent_us": cycle["p50_ms"] * 1000 / num_agents
+    }
+
+
+def start_bridge(protocol):
+    # ClojureBridge è un singleton: ogni configurazione ne crea uno nuovo
+    ClojureBridge._instance = None
+    return ClojureBridge(launcher=[sys.executable, str(STUB_KERNEL)], protocol=protocol,
+                         redis_client=fakeredis.FakeRedis() if fakeredis else None,
+                         health_interval=0, cache_size=0)
+
+
+def bench_bridge(protocol, requests, concurrency_levels, kernel_delay):
+    """Round trip sequenziale e throughput con richieste concorrenti"""
+    bridge = start_bridge(protocol)
+    try:
+        for index in range(50):  # riscaldamento
+            bridge._send_request("echo", {"index": index})
+        round_trips = []
+        for index in range(requests):
+            started = time.perf_counter()
+            bridge._send_request("echo", {"index": index})
+            round_trips.append(time.perf_counter() - started)
+
+        scaling = []
+        for concurrency in concurrency_levels:
+            total = concurrency * 50
+            window = threading.BoundedSemaphore(concurrency)
+            futures = []
+            started = time.perf_counter()
+            for index in range(total):
+                window.acquire()
+                future = bridge.submit("sleep", {"seconds": kernel_delay, "index": index})
+                future.add_done_callback(lambda _: window.release())
+                futures.append(future)
+            wait(futures)
+            elapsed = time.perf_counter() - started
+            scaling.append({
+                "concurrency": concurrency,
+                "requests": total,
+                "elapsed_s": elapsed,
+                "requests_per_s": total / elapsed
+            })
+    finally:
+        bridge.shutdown()
+        ClojureBridge._instance = None
+
+    return {
+        "protocol": protocol,
+        "kernel_delay_s": kernel_delay,
+        "round_trip": summarize(round_trips),
+        "concurrency": scaling
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    quick = args.quick
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick
+        }
+    }
+
+    if args.only in (None, "share"):
+        transports = ["in-process"] + (["fakeredis"] if fakeredis else [])
+        sizes = [2, 8] if quick else [2, 8, 32]
+        messages = 200 if quick else 1000
+        results["share"] = [bench_share(name, size, messages) for name in transports for size in sizes]
+        if not fakeredis:
+            results["share_skipped"] = "fakeredis non installato: solo InProcessTransport"
+
+    if args.only in (None, "cycle"):
+        sizes = [10, 50] if quick else [10, 50, 200]
+        results["cycle"] = [bench_cycle(size, 20 if quick else 100) for size in sizes]
+
+    if args.only in (None, "bridge"):
+        levels = [1, 4, 16] if quick else [1, 4, 16, 64]
+        results["bridge"] = []
+        for protocol in (PROTOCOL_STDIO, PROTOCOL_SOCKET):
+            try:
+                results["bridge"].append(bench_bridge(protocol, 200 if quick else 1000, levels, args.kernel_delay))
+            except Exception as e:
+                results["bridge"].append({"protocol": protocol, "skipped": str(e)})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline di MIA")
+    parser.add_argument("--output", help="File JSON dei risultati (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="Dimensioni ridotte, per un controllo rapido")
+    parser.add_argument("--only", choices=["share", "cycle", "bridge"], help="Esegue un solo gruppo di benchmark")
+    parser.add_argument("--kernel-delay", type=float, default=0.005,
+                        help="Secondi di lavoro simulato dal kernel stub nel test di concorrenza")
+    args = parser.parse_args()
+
+    logging.getLogger("mia.bridge").setLevel(logging.WARNING)
+    results = run(args)
+    encoded = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded + "\n")
+        print(f"📊 Risultati scritti in {args.output}")
+    else:
+        print(encoded)
+
+
+if __name__ == "__main__":
+    main()
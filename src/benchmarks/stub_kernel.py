@@ -0,0 +1,98 @@
+"""
+Kernel stub che parla il protocollo del bridge, per i benchmark offline.
+
+Sostituisce il kernel Clojure (ClojureBridge(launcher=[sys.executable, <questo file>]))
+e risponde subito a ogni richiesta con un'eco del payload, così i benchmark
+misurano solo il costo del bridge. Supporta entrambi i protocolli:
+- stdio: JSON una riga per messaggio su stdin/stdout
+- socket: "-m mia.framed <data.sock> <control.sock>", frame con prefisso di lunghezza
+
+Comandi riconosciuti oltre all'eco: "sleep" (payload {"seconds": s}) e "batch".
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+FRAME_HEADER = struct.Struct("!I")
+
+
+def execute(command, payload):
+    if command == "sleep":
+        time.sleep(payload.get("seconds", 0))
+    if command == "batch":
+        return {"results": [{"result": execute(task["task"], task["payload"])}
+                            for task in payload["tasks"]]}
+    return {"echo": command, "payload": payload}
+
+
+def respond(request):
+    return {"request_id": request["request_id"],
+            "result": execute(request.get("command"), request.get("payload", {}))}
+
+
+def read_frames(stream):
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        yield stream.read(FRAME_HEADER.unpack(header)[0])
+
+
+def serve_stdio():
+    lock = threading.Lock()
+
+    def emit(message):
+        with lock:
+            sys.stdout.write(json.dumps(message) + "\n")
+            sys.stdout.flush()
+
+    emit({"status": "ready"})
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("command") == "sleep":
+            threading.Thread(target=lambda r=request: emit(respond(r)), daemon=True).start()
+        else:
+            emit(respond(request))
+
+
+def serve_socket(data_path, control_path):
+    data = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    data.connect(data_path)
+    control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    control.connect(control_path)
+    lock = threading.Lock()
+
+    def send(sock, message):
+        body = json.dumps(message).encode("utf-8")
+        with lock:
+            sock.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+    def watch_control():
+        for body in read_frames(control.makefile("rb")):
+            if json.loads(body).get("command") == "shutdown":
+                break
+        os._exit(0)
+
+    send(control, {"status": "ready"})
+    threading.Thread(target=watch_control, daemon=True).start()
+    for body in read_frames(data.makefile("rb")):
+        request = json.loads(body)
+        if request.get("command") == "sleep":
+            threading.Thread(target=lambda r=request: send(data, respond(r)), daemon=True).start()
+        else:
+            send(data, respond(request))
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "-m" in args and args[args.index("-m") + 1] == "mia.framed":
+        index = args.index("-m")
+        serve_socket(args[index + 2], args[index + 3])
+    else:
+        serve_stdio()
@@ -1,21 +1,81 @@
 # src/mia/bridge.py (versione ottimizzata)
 
+import asyncio
+import itertools
+import os
 import subprocess
 import json
 import threading
 import queue
 import logging
+import shutil
+import socket
+import struct
+import tempfile
 import time
-from typing import Dict, List, Any, Optional
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import redis
 
+from .cache import ResultCache, canonical_key
+from .metrics import MetricsRegistry
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 LEIN_COMMAND = "lein"
+JAVA_COMMAND = "java"
+# Uberjar AOT prodotto da `lein uberjar` (profilo :uberjar di project.clj)
+UBERJAR_PATH = "target/uberjar/mia-0.1.0-SNAPSHOT-standalone.jar"
+# Stesse opzioni JVM di project.clj (:jvm-opts e profilo :uberjar)
+JVM_OPTS = ["-Xmx1g", "-Dclojure.compiler.direct-linking=true"]
+
+# Modalità di avvio dei kernel
+LAUNCH_AUTO = "auto"        # uberjar se presente e java disponibile, altrimenti lein
+LAUNCH_UBERJAR = "uberjar"
+LAUNCH_LEIN = "lein"
+LAUNCH_CUSTOM = "custom"    # comando esplicito (es. kernel stub per i benchmark)
+
+# Protocolli tra bridge e kernel
+PROTOCOL_STDIO = "stdio"    # JSON una riga per messaggio su stdin/stdout
+PROTOCOL_SOCKET = "socket"  # frame con prefisso di lunghezza su socket Unix (mia.framed)
+SOCKET_MAIN_NS = "mia.framed"
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+# kernel_id del kernel di riserva finché non prende il posto di uno slot
+STANDBY_SLOT = -1
+
+# Attesa tra tentativi di riavvio falliti di uno slot (raddoppia fino al massimo)
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 30.0
+
+
+def kernel_command(clojure_path: Path, launcher: Any = LAUNCH_AUTO, uberjar: Optional[str] = None,
+                   main_ns: str = "mia.core", args: Tuple[str, ...] = ()) -> Tuple[List[str], str]:
+    """
+    Comando di avvio del kernel e modalità effettivamente scelta.
+
+    Lanciare direttamente l'uberjar con `java -cp` evita l'avvio di
+    Leiningen, la risoluzione delle dipendenze e la compilazione a ogni
+    start; lein resta il fallback quando il jar non è stato costruito.
+    Se launcher è una lista viene usata come comando, seguito da
+    "-m <namespace>" e dagli argomenti.
+    """
+    if isinstance(launcher, (list, tuple)):
+        return [*launcher, "-m", main_ns, *args], LAUNCH_CUSTOM
+    jar = Path(uberjar or UBERJAR_PATH)
+    if not jar.is_absolute():
+        jar = clojure_path.resolve() / jar
+    if launcher == LAUNCH_UBERJAR or (launcher == LAUNCH_AUTO and jar.is_file() and shutil.which(JAVA_COMMAND)):
+        return [JAVA_COMMAND, *JVM_OPTS, "-cp", str(jar), "clojure.main", "-m", main_ns, *args], LAUNCH_UBERJAR
+    return [LEIN_COMMAND, "run", "-m", main_ns, *args], LAUNCH_LEIN
+
+# Comandi deterministici i cui risultati possono essere memorizzati
+CACHEABLE_COMMANDS = frozenset({"simulate-molecule", "symbolic-inference"})
 
 @dataclass
 class SimulationRequest:
@@ -24,156 +84,810 @@ class SimulationRequest:
     target_system: Dict[str, Any]
     # ... altri campi se necessario
 
-class ClojureBridge:
-    _instance = None
-    _lock = threading.Lock()
+class KernelRequest:
+    """Richiesta in volo verso un kernel, conservata per poterla riaccodare."""
+    __slots__ = ("request_id", "command", "payload", "line", "future", "attempts", "kernel")
 
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            with cls._lock:
-                if not cls._instance:
-                    cls._instance = super(ClojureBridge, cls).__new__(cls)
-        return cls._instance
+    def __init__(self, request_id: str, command: str, payload: Dict, line: str, future: Future):
+        self.request_id = request_id
+        self.command = command
+        self.payload = payload
+        self.line = line
+        self.future = future
+        self.attempts = 0
+        self.kernel = None
 
-    def __init__(self, clojure_project_path: str = "./", redis_host: str = "localhost", redis_port: int = 6379):
-        if hasattr(self, 'initialized'):
-            return
-        with self._lock:
-            if hasattr(self, 'initialized'):
-                return
 
-            self.clojure_path = Path(clojure_project_path)
-            self.process = None
-            self.reader_thread = None
-            self.output_queue = queue.Queue()
-            self.request_futures = {} # Per tracciare le risposte
+class ClojureKernel:
+    """
+    Un processo kernel Clojure persistente.
 
-            self.start_clojure_process()
+    Con il protocollo stdio un thread scrive su stdin le richieste accodate
+    (JSON una per riga), uno legge le risposte da stdout e le abbina alle
+    richieste in volo, uno inoltra stderr al log. Con il protocollo socket
+    richieste e risposte viaggiano in frame con prefisso di lunghezza su un
+    socket Unix dedicato, i messaggi di controllo (ready, shutdown) su un
+    secondo socket e stdout resta solo diagnostico.
+    Quando il processo termina, le richieste ancora in volo vengono passate
+    a on_exit, così il pool può riaccodarle su un altro kernel.
+    """
 
-            try:
-                self.redis_client = redis.Redis(host=redis_host, port=redis_port)
-                self.redis_client.ping()
-                logger.info("✅ Connessione Redis stabilita")
-            except Exception as e:
-                logger.error(f"❌ Errore connessione Redis: {e}")
-                raise
+    def __init__(self, kernel_id: int, clojure_path: Path, on_exit=None, ready_timeout: float = 30,
+                 launcher: Any = LAUNCH_AUTO, uberjar: Optional[str] = None,
+                 protocol: str = PROTOCOL_STDIO):
+        self.kernel_id = kernel_id
+        self.clojure_path = clojure_path
+        self.on_exit = on_exit
+        self.ready_timeout = ready_timeout
+        self.protocol = protocol
+        self.launcher = launcher
+        self.uberjar = uberjar
+        self.command: List[str] = []
+        self.startup_time: Optional[float] = None
+        self.process = None
+        self.socket_dir = None
+        self.data_socket = None
+        self.control_socket = None
+        self.output_queue = queue.Queue()
+        self.pending: Dict[str, KernelRequest] = {}
+        self.pending_lock = threading.Lock()
+        self.write_queue = queue.SimpleQueue()
+        self.write_lock = threading.Lock()
+        self.stopping = False
+        self.exited = False
 
-            self.initialized = True
-            logger.info("🌉 Bridge Python-Clojure inizializzato e operativo.")
+    @property
+    def outstanding(self) -> int:
+        """Richieste inviate a questo kernel e non ancora risolte"""
+        return len(self.pending)
 
-    def start_clojure_process(self):
-        """Avvia il kernel Clojure come processo persistente."""
-        if self.process and self.process.poll() is None:
-            logger.warning("Il processo Clojure è già in esecuzione.")
-            return
+    def is_alive(self) -> bool:
+        return (self.process is not None and not self.exited and not self.stopping
+                and self.process.poll() is None)
 
+    def start(self):
+        """Avvia il processo e attende il messaggio di 'ready'."""
         try:
-            logger.info(f"Avvio del kernel Clojure dal percorso: {self.clojure_path.resolve()}")
+            if self.protocol == PROTOCOL_SOCKET:
+                self.socket_dir = tempfile.mkdtemp(prefix="mia-kernel-")
+                paths = [os.path.join(self.socket_dir, name) for name in ("data.sock", "control.sock")]
+                listeners = [_listen_unix(path) for path in paths]
+                self.command, self.launcher = kernel_command(self.clojure_path, self.launcher, self.uberjar,
+                                                             SOCKET_MAIN_NS, paths)
+            else:
+                self.command, self.launcher = kernel_command(self.clojure_path, self.launcher, self.uberjar)
+
+            logger.info(f"Avvio del kernel Clojure #{self.kernel_id} ({self.launcher}, {self.protocol}) "
+                        f"dal percorso: {self.clojure_path.resolve()}")
+            started = time.monotonic()
             self.process = subprocess.Popen(
-                [LEIN_COMMAND, "run", "-m", "mia.core"],
+                self.command,
                 cwd=str(self.clojure_path.resolve()),
-                stdin=subprocess.PIPE,
+                stdin=subprocess.DEVNULL if self.protocol == PROTOCOL_SOCKET else subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
                 bufsize=1
             )
 
-            self.reader_thread = threading.Thread(target=self._enqueue_output, daemon=True)
-            self.reader_thread.start()
-            
-            error_thread = threading.Thread(target=self._log_stderr, daemon=True)
-            error_thread.start()
+            if self.protocol == PROTOCOL_SOCKET:
+                deadline = started + self.ready_timeout
+                try:
+                    self.data_socket, self.control_socket = [self._accept(listener, deadline)
+                                                             for listener in listeners]
+                finally:
+                    for listener in listeners:
+                        listener.close()
+                threading.Thread(target=self._read_frames, daemon=True).start()
+                threading.Thread(target=self._read_control, daemon=True).start()
+                threading.Thread(target=self._write_frames, daemon=True).start()
+                threading.Thread(target=self._log_stdout, daemon=True).start()
+            else:
+                threading.Thread(target=self._enqueue_output, daemon=True).start()
+                threading.Thread(target=self._write_requests, daemon=True).start()
+            threading.Thread(target=self._log_stderr, daemon=True).start()
 
             # Attendi il messaggio di 'ready' dal kernel
             try:
-                initial_response = self.output_queue.get(timeout=30)
-                if json.loads(initial_response).get("status") != "ready":
+                # Il reader thread ha già decodificato il JSON
+                initial_response = self.output_queue.get(timeout=max(started + self.ready_timeout - time.monotonic(), 0))
+                if not isinstance(initial_response, dict) or initial_response.get("status") != "ready":
                     raise RuntimeError("Il kernel Clojure non si è avviato correttamente.")
-                logger.info("✅ Kernel Clojure pronto e in ascolto.")
-            except (queue.Empty, json.JSONDecodeError) as e:
+                self.startup_time = time.monotonic() - started
+                logger.info(f"✅ Kernel Clojure #{self.kernel_id} pronto e in ascolto "
+                            f"(avvio {self.launcher} in {self.startup_time:.2f} s).")
+            except queue.Empty as e:
                 logger.error(f"Nessuna risposta di 'ready' dal kernel Clojure. Errore: {e}")
                 self.shutdown()
                 raise RuntimeError("Impossibile inizializzare il kernel Clojure.")
 
         except FileNotFoundError:
-            logger.error(f"ERRORE CRITICO: Comando '{LEIN_COMMAND}' non trovato.")
+            logger.error(f"ERRORE CRITICO: Comando '{self.command[0]}' non trovato.")
+            self._cleanup_sockets()
             raise
         except Exception as e:
             logger.error(f"ERRORE CRITICO nell'avvio del processo Clojure: {e}")
+            self.shutdown()
             raise
 
+    def _accept(self, listener: socket.socket, deadline: float) -> socket.socket:
+        """Attende la connessione del kernel, interrompendosi se il processo termina."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("Il kernel Clojure non si è connesso al socket del bridge.")
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Il kernel Clojure è terminato all'avvio (codice {self.process.returncode}).")
+            listener.settimeout(min(remaining, 0.5))
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            return connection
+
+    def send(self, request: KernelRequest) -> bool:
+        """Accoda una richiesta; False se il kernel non è in grado di riceverla."""
+        if not self.is_alive():
+            return False
+        if self.protocol == PROTOCOL_SOCKET:
+            try:
+                data = _frame(request.line.rstrip('\n').encode('utf-8'))
+            except ValueError as e:
+                # Richiesta non inviabile: nessun altro kernel potrebbe accettarla
+                _fail(request.future, str(e))
+                return True
+        else:
+            data = request.line
+        request.kernel = self
+        with self.pending_lock:
+            # Ricontrolla sotto lock: il reader potrebbe aver appena visto la chiusura
+            if self.exited:
+                return False
+            self.pending[request.request_id] = request
+        self.write_queue.put(data)
+        return True
+
+    def forget(self, request_id: str) -> None:
+        """Smette di attendere la risposta di una richiesta (es. dopo un timeout)."""
+        with self.pending_lock:
+            self.pending.pop(request_id, None)
+
+    def _handle_response(self, response: Any) -> None:
+        request_id = response.get("request_id") if isinstance(response, dict) else None
+        with self.pending_lock:
+            request = self.pending.pop(request_id, None)
+        if request is not None:
+            _resolve(request.future, request_id, response)
+        else:
+            # Per output non richiesti o broadcast
+            self.output_queue.put(response)
+
     def _enqueue_output(self):
         """Legge l'output JSON da stdout e lo mette in una coda o abbina alle richieste."""
         for line in iter(self.process.stdout.readline, ''):
             try:
                 response = json.loads(line)
-                request_id = response.get("request_id")
-                if request_id in self.request_futures:
-                    future = self.request_futures.pop(request_id)
-                    future.put(response)
-                else:
-                    # Per output non richiesti o broadcast
-                    self.output_queue.put(response)
             except json.JSONDecodeError:
                 logger.warning(f"Output non-JSON ricevuto da Clojure: {line.strip()}")
+                continue
+            self._handle_response(response)
+        self._handle_exit()
+
+    def _read_frames(self):
+        """Legge le risposte dal socket dati, un frame JSON per risposta."""
+        reader = self.data_socket.makefile('rb')
+        try:
+            while True:
+                body = _read_frame(reader)
+                if body is None:
+                    break
+                try:
+                    response = json.loads(body)
+                except ValueError:
+                    logger.warning(f"Frame non-JSON ricevuto dal kernel #{self.kernel_id}")
+                    continue
+                self._handle_response(response)
+        except (OSError, ValueError) as e:
+            logger.error(f"Lettura dal kernel #{self.kernel_id} fallita: {e}")
+            self.kill()
+        finally:
+            reader.close()
+        self._handle_exit()
+
+    def _read_control(self):
+        """Messaggi del canale di controllo (ready, eventi del kernel)."""
+        reader = self.control_socket.makefile('rb')
+        try:
+            while True:
+                body = _read_frame(reader)
+                if body is None:
+                    break
+                try:
+                    self.output_queue.put(json.loads(body))
+                except ValueError:
+                    logger.warning(f"Messaggio di controllo non valido dal kernel #{self.kernel_id}")
+        except (OSError, ValueError):
+            pass
+        finally:
+            reader.close()
+
+    def _handle_exit(self):
+        # Canale delle risposte chiuso: il kernel è terminato, nessuna risposta arriverà più
+        with self.pending_lock:
+            self.exited = True
+            orphans = list(self.pending.values())
+            self.pending.clear()
+        self.write_queue.put(None)
+        if self.on_exit and not self.stopping:
+            self.on_exit(self, orphans)
+        else:
+            for request in orphans:
+                _fail(request.future, "Kernel Clojure terminato")
+
+    def _drain_writes(self, first):
+        """Raccoglie quanto già accodato dopo first, per ridurre le syscall di scrittura."""
+        items = [first]
+        while True:
+            try:
+                item = self.write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.write_queue.put(None)
+                break
+            items.append(item)
+        return items
+
+    def _write_requests(self):
+        """Scrive su stdin le richieste accodate, con un solo flush per raffica."""
+        while True:
+            line = self.write_queue.get()
+            if line is None:
+                break
+            lines = self._drain_writes(line)
+            try:
+                with self.write_lock:
+                    self.process.stdin.write(''.join(lines))
+                    self.process.stdin.flush()
+            except (OSError, ValueError) as e:
+                # Pipe rotta: il reader vedrà la chiusura e gestirà le richieste in volo
+                logger.error(f"Scrittura verso il kernel #{self.kernel_id} fallita: {e}")
+                self.kill()
+                break
+
+    def _write_frames(self):
+        """Invia sul socket dati i frame accodati, con una sola sendall per raffica."""
+        while True:
+            frame = self.write_queue.get()
+            if frame is None:
+                break
+            frames = self._drain_writes(frame)
+            try:
+                with self.write_lock:
+                    self.data_socket.sendall(b''.join(frames))
+            except OSError as e:
+                logger.error(f"Scrittura verso il kernel #{self.kernel_id} fallita: {e}")
+                self.kill()
+                break
+
+    def _send_control(self, message: Dict[str, Any]) -> None:
+        try:
+            with self.write_lock:
+                self.control_socket.sendall(_frame(json.dumps(message).encode('utf-8')))
+        except OSError:
+            pass
+
+    def _log_stdout(self):
+        """Con il protocollo socket stdout è solo diagnostico."""
+        for line in iter(self.process.stdout.readline, ''):
+            logger.debug(f"[Clojure Kernel #{self.kernel_id}] {line.rstrip()}")
 
     def _log_stderr(self):
         """Logga l'output di errore dal processo Clojure."""
         for line in iter(self.process.stderr.readline, ''):
-            logger.error(f"[Clojure Kernel] {line.strip()}")
+            logger.error(f"[Clojure Kernel #{self.kernel_id}] {line.strip()}")
 
-    def _send_request(self, command: str, payload: Dict, timeout: int = 30) -> Dict:
-        """Invia una richiesta al kernel e attende una risposta specifica."""
-        request_id = f"req_{int(time.time() * 1000)}"
-        
+    def kill(self):
+        """Termina il processo senza segnare il kernel come fermato volontariamente."""
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+
+    def shutdown(self):
+        self.stopping = True
+        self.write_queue.put(None)
+        if self.process and self.process.poll() is None and self.control_socket is not None:
+            # Chiusura ordinata tramite il canale di controllo
+            self._send_control({"command": "shutdown"})
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._cleanup_sockets()
+
+    def _cleanup_sockets(self):
+        for sock in (self.data_socket, self.control_socket):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        if self.socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+            self.socket_dir = None
+
+
+def _frame(body: bytes) -> bytes:
+    if len(body) > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame di {len(body)} byte oltre il limite di {MAX_FRAME_SIZE}")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def _read_frame(reader) -> Optional[bytes]:
+    """Legge un frame con prefisso di lunghezza; None a fine stream."""
+    header = reader.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame di {size} byte oltre il limite di {MAX_FRAME_SIZE}")
+    body = reader.read(size)
+    if len(body) < size:
+        return None
+    return body
+
+
+def _listen_unix(path: str) -> socket.socket:
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    return listener
+
+
+def _resolve(future: Future, request_id: str, response: Dict) -> None:
+    if "error" in response:
+        logger.error(f"Errore dal kernel per la richiesta {request_id}: {response['error']}")
+    if not future.done():
+        future.set_result(response.get("result", {"error": "Nessun risultato nella risposta"}))
+
+
+def _fail(future: Future, reason: str) -> None:
+    if not future.done():
+        future.set_result({"error": reason})
+
+
+class ClojureBridge:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(ClojureBridge, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, clojure_project_path: str = "./", redis_host: str = "localhost", redis_port: int = 6379,
+                 pool_size: int = 1, health_interval: float = 10.0, health_timeout: float = 5.0,
+                 max_retries: int = 2, cache_size: int = 4096, cache_ttl: Optional[float] = 300.0,
+                 shared_cache: bool = False, launcher: Any = LAUNCH_AUTO, uberjar: Optional[str] = None,
+                 standby: bool = False, protocol: str = PROTOCOL_STDIO, redis_client=None):
+        """
+        Args:
+            clojure_project_path: Cartella del progetto Clojure (project.clj)
+            pool_size: Numero di kernel Clojure nel pool
+            health_interval: Secondi tra due sonde health-check (0 disattiva il monitor)
+            health_timeout: Secondi oltre i quali un kernel che non risponde viene riavviato
+            max_retries: Quante volte una richiesta in volo su un kernel caduto viene riaccodata
+            cache_size: Risultati conservati nella cache locale (0 disattiva la cache)
+            cache_ttl: Validità in secondi di un risultato in cache (None = nessuna scadenza)
+            shared_cache: Se True la cache usa anche Redis, condivisa da tutti i processi
+            launcher: LAUNCH_AUTO, LAUNCH_UBERJAR, LAUNCH_LEIN o un comando esplicito (lista)
+            uberjar: Percorso dell'uberjar (default: UBERJAR_PATH nel progetto)
+            standby: Se True mantiene un kernel di riserva già avviato, che
+                sostituisce all'istante un kernel caduto o riavviato
+            protocol: PROTOCOL_STDIO (default) o PROTOCOL_SOCKET (frame binari su socket Unix)
+            redis_client: Client Redis già configurato (es. fakeredis); None = redis_host:redis_port
+        """
+        if hasattr(self, 'initialized'):
+            return
+        with self._lock:
+            if hasattr(self, 'initialized'):
+                return
+
+            self.clojure_path = Path(clojure_project_path)
+            self.pool_size = pool_size
+            self.health_interval = health_interval
+            self.health_timeout = health_timeout
+            self.max_retries = max_retries
+            self.launcher = launcher
+            self.uberjar = uberjar
+            self.protocol = protocol
+            self.standby = standby
+            self.standby_kernel: Optional[ClojureKernel] = None
+            self.standby_starting = False
+            self.kernels: List[Optional[ClojureKernel]] = [None] * pool_size
+            self.kernels_lock = threading.Lock()
+            self.restarting = set()
+            self.restart_failures: Dict[int, int] = {}  # slot -> riavvii falliti consecutivi
+            # Richieste in attesa di un kernel vivo (pool temporaneamente vuoto)
+            self.parked: List[KernelRequest] = []
+            # Id univoci anche per richieste nello stesso millisecondo o da più processi
+            self.request_ids = itertools.count(1)
+            self.request_prefix = f"req_{os.getpid()}_{id(self):x}"
+            self.running = True
+
+            self.metrics = MetricsRegistry({'component': 'bridge'})
+            self.latency = self.metrics.histogram('mia_bridge_latency_seconds', 'Tempo tra invio e risposta del kernel')
+            self.timeouts = self.metrics.counter('mia_bridge_timeouts_total', 'Richieste scadute senza risposta')
+            self.errors = self.metrics.counter('mia_bridge_errors_total', 'Risposte con errore')
+            self.metrics.gauge('mia_bridge_in_flight', 'Richieste inviate e non ancora risolte',
+                               function=lambda: sum(k.outstanding for k in self.kernels if k) + len(self.parked))
+
+            self.start_clojure_process()
+            if standby:
+                self._schedule_standby()
+
+            try:
+                self.redis_client = redis_client or redis.Redis(host=redis_host, port=redis_port)
+                self.redis_client.ping()
+                logger.info("✅ Connessione Redis stabilita")
+            except Exception as e:
+                logger.error(f"❌ Errore connessione Redis: {e}")
+                raise
+
+            self.cache = ResultCache(cache_size, cache_ttl,
+                                     redis_client=self.redis_client if shared_cache else None) if cache_size else None
+
+            if health_interval:
+                threading.Thread(target=self._monitor_kernels, daemon=True).start()
+
+            self.initialized = True
+            logger.info(f"🌉 Bridge Python-Clojure inizializzato e operativo ({pool_size} kernel).")
+
+    @property
+    def process(self):
+        """Processo del primo kernel (compatibilità con il bridge a kernel singolo)."""
+        kernel = self.kernels[0] if self.kernels else None
+        return kernel.process if kernel else None
+
+    def start_clojure_process(self):
+        """Avvia i kernel del pool non ancora in esecuzione."""
+        for slot, kernel in enumerate(self.kernels):
+            if kernel and kernel.is_alive():
+                logger.warning(f"Il kernel Clojure #{slot} è già in esecuzione.")
+                continue
+            self.kernels[slot] = self._spawn_kernel(slot)
+
+    def _spawn_kernel(self, slot: int) -> ClojureKernel:
+        kernel = ClojureKernel(slot, self.clojure_path, on_exit=self._on_kernel_exit,
+                               launcher=self.launcher, uberjar=self.uberjar, protocol=self.protocol)
+        kernel.start()
+        return kernel
+
+    def _schedule_standby(self) -> None:
+        """Avvia in background un nuovo kernel di riserva, se non già presente."""
+        with self.kernels_lock:
+            if (self.standby_starting or not self.running
+                    or (self.standby_kernel and self.standby_kernel.is_alive())):
+                return
+            self.standby_starting = True
+        threading.Thread(target=self._start_standby, daemon=True).start()
+
+    def _start_standby(self) -> None:
+        try:
+            kernel = self._spawn_kernel(STANDBY_SLOT)
+        except Exception as e:
+            logger.error(f"Avvio del kernel Clojure di riserva fallito: {e}")
+            kernel = None
+        with self.kernels_lock:
+            self.standby_starting = False
+            if kernel and not self.running:
+                kernel.shutdown()
+                return
+            self.standby_kernel = kernel
+
+    def _take_standby(self) -> Optional[ClojureKernel]:
+        """Preleva il kernel di riserva, se pronto, e ne avvia subito un altro."""
+        with self.kernels_lock:
+            kernel, self.standby_kernel = self.standby_kernel, None
+        if kernel and not kernel.is_alive():
+            kernel = None
+        if self.standby:
+            self._schedule_standby()
+        return kernel
+
+    def _alive_kernels(self) -> List[ClojureKernel]:
+        return [kernel for kernel in self.kernels if kernel and kernel.is_alive()]
+
+    def _dispatch(self, request: KernelRequest) -> None:
+        """Invia la richiesta al kernel vivo con meno richieste in volo."""
+        while True:
+            candidates = self._alive_kernels()
+            if not candidates:
+                with self.kernels_lock:
+                    if self.restarting and self.running:
+                        # Un kernel sta ripartendo: la richiesta verrà inviata appena pronto
+                        self.parked.append(request)
+                        return
+                _fail(request.future, "Nessun kernel Clojure disponibile")
+                return
+            kernel = min(candidates, key=lambda k: k.outstanding)
+            if kernel.send(request):
+                return
+
+    def _on_kernel_exit(self, kernel: ClojureKernel, orphans: List[KernelRequest]) -> None:
+        """Un kernel è terminato inaspettatamente: lo riavvia e riaccoda le sue richieste."""
+        if kernel.kernel_id == STANDBY_SLOT:
+            logger.error("❌ Kernel Clojure di riserva terminato, riavvio")
+            with self.kernels_lock:
+                if self.standby_kernel is kernel:
+                    self.standby_kernel = None
+            self._schedule_standby()
+            return
+        logger.error(f"❌ Kernel Clojure #{kernel.kernel_id} terminato, {len(orphans)} richieste da riaccodare")
+        # Il monitor può aver già sostituito il kernel nello slot
+        if self.kernels[kernel.kernel_id] is kernel:
+            self._schedule_restart(kernel.kernel_id)
+        for request in orphans:
+            request.attempts += 1
+            if request.attempts > self.max_retries:
+                _fail(request.future, "Kernel Clojure terminato")
+            else:
+                self._dispatch(request)
+
+    def _schedule_restart(self, slot: int) -> None:
+        with self.kernels_lock:
+            if slot in self.restarting or not self.running:
+                return
+            self.restarting.add(slot)
+        threading.Thread(target=self._restart_kernel, args=(slot,), daemon=True).start()
+
+    def _restart_kernel(self, slot: int) -> None:
+        if not self.running:
+            with self.kernels_lock:
+                self.restarting.discard(slot)
+            return
+        try:
+            kernel = self._take_standby()
+            if kernel:
+                kernel.kernel_id = slot
+                self.kernels[slot] = kernel
+                logger.info(f"🔁 Kernel Clojure #{slot} sostituito dal kernel di riserva")
+            else:
+                kernel = self._spawn_kernel(slot)
+                self.kernels[slot] = kernel
+                logger.info(f"🔁 Kernel Clojure #{slot} riavviato")
+        except Exception as e:
+            # Il kernel morto non deve restare nello slot, e lo slot resta in
+            # restarting: le richieste senza kernel vivi restano parcheggiate
+            self.kernels[slot] = None
+            failures = self.restart_failures.get(slot, 0) + 1
+            self.restart_failures[slot] = failures
+            delay = min(RESTART_BACKOFF * 2 ** (failures - 1), RESTART_BACKOFF_MAX)
+            logger.error(f"Riavvio del kernel Clojure #{slot} fallito ({failures}° tentativo), "
+                         f"nuovo tentativo tra {delay:.0f}s: {e}")
+            if self.running:
+                retry = threading.Timer(delay, self._restart_kernel, args=(slot,))
+                retry.daemon = True
+                retry.start()
+                self._release_parked()
+                return
+        else:
+            self.restart_failures.pop(slot, None)
+        with self.kernels_lock:
+            self.restarting.discard(slot)
+        self._release_parked()
+
+    def _release_parked(self) -> None:
+        """Rinvia le richieste parcheggiate (vengono riparcheggiate se non c'è ancora un kernel vivo)."""
+        with self.kernels_lock:
+            parked, self.parked = self.parked, []
+        for request in parked:
+            self._dispatch(request)
+
+    def _monitor_kernels(self) -> None:
+        """Sonda periodicamente i kernel e riavvia quelli morti o bloccati."""
+        while self.running:
+            time.sleep(self.health_interval)
+            for slot, kernel in enumerate(list(self.kernels)):
+                if not self.running:
+                    return
+                if kernel is None or not kernel.is_alive():
+                    # Di norma è già _on_kernel_exit a riavviarlo: _schedule_restart
+                    # ignora gli slot già in restarting
+                    self._schedule_restart(slot)
+                    continue
+                probe = self._new_request("health-check", {})
+                if not kernel.send(probe):
+                    continue
+                try:
+                    probe.future.result(timeout=self.health_timeout)
+                except FutureTimeoutError:
+                    logger.error(f"Kernel Clojure #{slot} non risponde all'health-check, riavvio")
+                    kernel.forget(probe.request_id)
+                    kernel.kill()
+            if self.standby:
+                self._schedule_standby()
+
+    def _new_request(self, command: str, payload: Dict) -> KernelRequest:
+        request_id = f"{self.request_prefix}_{next(self.request_ids)}"
         request = {
             "request_id": request_id,
             "command": command,
             "payload": payload
         }
+        future = Future()
+        future.request_id = request_id
+        return KernelRequest(request_id, command, payload, json.dumps(request) + '\n', future)
+
+    def submit(self, command: str, payload: Dict) -> Future:
+        """
+        Invia una richiesta al pool senza attendere la risposta.
         
-        future = queue.Queue()
-        self.request_futures[request_id] = future
-        
+        Returns:
+            Future che si risolve con il risultato del kernel (o con un dict
+            {"error": ...}); molte richieste possono essere in volo insieme,
+            distribuite sul kernel con meno richieste pendenti.
+        """
+        try:
+            request = self._new_request(command, payload)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Errore durante la serializzazione della richiesta {command}: {e}")
+            future = Future()
+            future.set_result({"error": str(e)})
+            return future
+        future = request.future
+        future.kernel_request = request
+        self.metrics.counter('mia_bridge_requests_total', 'Richieste inviate al kernel', {'command': command}).inc()
+        started = time.monotonic()
+        future.add_done_callback(lambda done: self._observe(done, started))
+        self._dispatch(request)
+        return future
+
+    def _observe(self, future: Future, started: float) -> None:
+        self.latency.observe(time.monotonic() - started)
+        result = future.result()
+        if isinstance(result, dict) and "error" in result:
+            self.errors.inc()
+
+    def submit_async(self, command: str, payload: Dict) -> "asyncio.Future":
+        """Variante awaitable di submit() per codice asyncio."""
+        return asyncio.wrap_future(self.submit(command, payload))
+
+    def _send_request(self, command: str, payload: Dict, timeout: int = 30) -> Dict:
+        """Invia una richiesta al kernel e attende una risposta specifica."""
+        future = self.submit(command, payload)
         try:
-            self.process.stdin.write(json.dumps(request) + '\n')
-            self.process.stdin.flush()
-            
-            # Attendi la risposta
-            response = future.get(timeout=timeout)
-            if "error" in response:
-                logger.error(f"Errore dal kernel per la richiesta {request_id}: {response['error']}")
-            return response.get("result", {"error": "Nessun risultato nella risposta"})
-
-        except queue.Empty:
-            logger.error(f"Timeout in attesa della risposta per la richiesta {request_id}")
-            self.request_futures.pop(request_id, None)
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            request = future.kernel_request
+            logger.error(f"Timeout in attesa della risposta per la richiesta {request.request_id}")
+            if request.kernel:
+                request.kernel.forget(request.request_id)
+            self.timeouts.inc()
             return {"error": "Timeout"}
-        except Exception as e:
-            logger.error(f"Errore durante l'invio della richiesta {request_id}: {e}")
-            self.request_futures.pop(request_id, None)
-            return {"error": str(e)}
+
+    def pool_status(self) -> List[Dict[str, Any]]:
+        """Stato di ciascun kernel del pool (più quello di riserva, se attivo)"""
+        status = [{"kernel": slot,
+                   "alive": bool(kernel and kernel.is_alive()),
+                   "outstanding": kernel.outstanding if kernel else 0,
+                   "restarting": slot in self.restarting,
+                   "launcher": kernel.launcher if kernel else None,
+                   "startup_time": kernel.startup_time if kernel else None}
+                  for slot, kernel in enumerate(self.kernels)]
+        if self.standby:
+            kernel = self.standby_kernel
+            status.append({"kernel": "standby",
+                           "alive": bool(kernel and kernel.is_alive()),
+                           "outstanding": 0,
+                           "restarting": self.standby_starting,
+                           "launcher": kernel.launcher if kernel else None,
+                           "startup_time": kernel.startup_time if kernel else None})
+        return status
+
+    def _cached_request(self, command: str, payload: Dict) -> Dict:
+        """Come _send_request, ma servendo dalla cache le richieste già viste."""
+        if self.cache is None or command not in CACHEABLE_COMMANDS:
+            return self._send_request(command, payload)
+        key = canonical_key(command, payload)
+        hit, result = self.cache.get(key)
+        if hit:
+            return result
+        result = self._send_request(command, payload)
+        # Errori e timeout non vanno memorizzati: la richiesta successiva li ritenta
+        if not (isinstance(result, dict) and "error" in result):
+            self.cache.put(key, result)
+        return result
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Contatori della cache dei risultati (hit, miss, evizioni, ...)"""
+        return self.cache.get_stats() if self.cache else {}
 
     # --- API PUBBLICHE (esempi) ---
     def simulate_molecule(self, atoms: List[str], conditions: Dict[str, Any]) -> Dict[str, Any]:
-        logger.info(f"🧪 Simulazione molecolare: {'-'.join(atoms)}")
+        logger.debug("🧪 Simulazione molecolare: %s", '-'.join(atoms))
         payload = {"atoms": atoms, "conditions": conditions}
-        return self._send_request("simulate-molecule", payload)
+        return self._cached_request("simulate-molecule", payload)
 
     def symbolic_inference(self, premise: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        logger.info(f"🧠 Inferenza simbolica: {premise[:50]}...")
+        logger.debug("🧠 Inferenza simbolica: %s...", premise[:50])
         payload = {"premise": premise, "context": context}
-        return self._send_request("symbolic-inference", payload)
+        return self._cached_request("symbolic-inference", payload)
+
+    def batch(self, command: str, payloads: List[Dict[str, Any]], timeout: int = 120) -> List[Dict[str, Any]]:
+        """
+        Invia più task dello stesso tipo in un'unica richiesta "batch".
+        
+        I task già in cache non vengono inviati al kernel; se lo sono tutti
+        il round trip viene evitato del tutto.
+
+        Returns:
+            Un elemento per payload, nello stesso ordine: il risultato del
+            task oppure {"error": ...} se quel singolo task è fallito.
+        """
+        if not payloads:
+            return []
+        output: List[Optional[Dict[str, Any]]] = [None] * len(payloads)
+        keys: List[Optional[str]] = [None] * len(payloads)
+        missing = []
+        for index, payload in enumerate(payloads):
+            if self.cache is not None and command in CACHEABLE_COMMANDS:
+                keys[index] = canonical_key(command, payload)
+                hit, result = self.cache.get(keys[index])
+                if hit:
+                    output[index] = result
+                    continue
+            missing.append(index)
+        if not missing:
+            return output
+
+        tasks = [{"task": command, "payload": payloads[index]} for index in missing]
+        response = self._send_request("batch", {"tasks": tasks}, timeout=timeout)
+        
+        results = response.get("results") if isinstance(response, dict) else None
+        if not isinstance(results, list) or len(results) != len(missing):
+            error = response.get("error", "Risposta batch non valida") if isinstance(response, dict) else "Risposta batch non valida"
+            for index in missing:
+                output[index] = {"error": error}
+            return output
+        for index, item in zip(missing, results):
+            if "result" in item:
+                output[index] = item["result"]
+                if keys[index] is not None:
+                    self.cache.put(keys[index], item["result"])
+            else:
+                output[index] = {"error": item.get("error", "Errore sconosciuto")}
+        return output
+
+    def simulate_molecules_batch(self, molecules: List[Tuple[List[str], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Simula molte molecole (atoms, conditions) con un solo round trip verso il kernel."""
+        logger.debug("🧪 Simulazione molecolare batch: %d molecole", len(molecules))
+        return self.batch("simulate-molecule",
+                          [{"atoms": atoms, "conditions": conditions} for atoms, conditions in molecules])
+
+    def symbolic_inference_batch(self, inferences: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Esegue molte inferenze (premise, context) con un solo round trip verso il kernel."""
+        logger.debug("🧠 Inferenza simbolica batch: %d premesse", len(inferences))
+        return self.batch("symbolic-inference",
+                          [{"premise": premise, "context": context} for premise, context in inferences])
 
     def health_check(self) -> Dict[str, Any]:
         return self._send_request("health-check", {})
 
     def shutdown(self):
         logger.info("🔄 Shutdown bridge in corso...")
-        if self.process:
-            self.process.terminate()
-            self.process.wait(timeout=5)
+        self.running = False
+        for kernel in [*self.kernels, self.standby_kernel]:
+            if kernel:
+                kernel.shutdown()
         logger.info("✅ Bridge shutdown completato")
 
 # Mantieni la tua classe SymbolicBridge che eredita da questa
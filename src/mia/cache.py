@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value: Any) -> Any:
+    """Forma canonica JSON-compatibile: chiavi ordinate, numeri come float, stringhe senza spazi ai bordi."""
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return value.strip()
+    return str(value)
+
+
+def canonical_key(command: str, payload: Dict[str, Any]) -> str:
+    """
+    Chiave di cache di una richiesta al kernel.
+
+    Per simulate-molecule conta solo il multiset degli atomi (l'ordine è
+    irrilevante per mia.ksn/deduce-formula) più le condizioni normalizzate;
+    per symbolic-inference la premessa è normalizzata negli spazi.
+    """
+    canonical = dict(payload)
+    if command == "simulate-molecule" and "atoms" in canonical:
+        canonical["atoms"] = sorted(json.dumps(_normalize(atom), sort_keys=True) for atom in canonical["atoms"])
+    elif command == "symbolic-inference" and isinstance(canonical.get("premise"), str):
+        canonical["premise"] = " ".join(canonical["premise"].split())
+    encoded = json.dumps(_normalize(canonical), sort_keys=True, separators=(",", ":"))
+    return f"{command}:{hashlib.sha1(encoded.encode('utf-8')).hexdigest()}"
+
+
+class ResultCache:
+    """
+    Cache dei risultati del kernel a due livelli.
+
+    Il livello locale è un LRU con limite di elementi e TTL; il livello
+    opzionale su Redis è condiviso da tutti i processi di agenti. Gli errori
+    del livello Redis vengono contati e ignorati: la cache non deve mai far
+    fallire una richiesta. I valori del livello locale sono restituiti senza
+    copia: i chiamanti non devono modificarli.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: Optional[float] = 300.0,
+                 redis_client=None, redis_prefix: str = "mia:cache:", redis_ttl: Optional[float] = None):
+        """
+        Args:
+            max_entries: Elementi massimi nel livello locale
+            ttl: Validità in secondi di un risultato (None = nessuna scadenza)
+            redis_client: Client Redis per il livello condiviso (None = solo locale)
+            redis_prefix: Prefisso delle chiavi su Redis
+            redis_ttl: Validità su Redis (default: ttl)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.redis_prefix = redis_prefix
+        self.redis_ttl = redis_ttl if redis_ttl is not None else ttl
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "redis_hits": 0,
+            "redis_errors": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Restituisce (trovato, valore)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return True, value
+                del self._entries[key]
+                self.stats["expirations"] += 1
+
+        if self.redis_client is not None:
+            try:
+                raw = self.redis_client.get(self.redis_prefix + key)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                logger.warning(f"Cache Redis non disponibile: {e}")
+                raw = None
+            if raw is not None:
+                try:
+                    value = json.loads(raw)
+                except ValueError as e:
+                    # Valore corrotto o scritto da altri: conta come miss e viene rimosso
+                    self.stats["redis_errors"] += 1
+                    logger.warning(f"Valore non valido in cache Redis per {key}, scartato: {e}")
+                    try:
+                        self.redis_client.delete(self.redis_prefix + key)
+                    except Exception:
+                        pass
+                    raw = None
+            if raw is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self.stats["hits"] += 1
+                    self.stats["redis_hits"] += 1
+                return True, value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return False, None
+
+    def put(self, key: str, value: Any) -> None:
+        self._store_local(key, value)
+        if self.redis_client is not None:
+            try:
+                expire = int(self.redis_ttl) if self.redis_ttl else None
+                self.redis_client.set(self.redis_prefix + key, json.dumps(value), ex=expire)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                logger.warning(f"Scrittura cache Redis fallita: {e}")
+
+    def _store_local(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Svuota il livello locale (quello Redis scade per TTL)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,80 @@
+(ns mia.framed
+  (:require [clojure.data.json :as json]
+            [mia.ksn :as ksn])
+  (:import (java.net StandardProtocolFamily UnixDomainSocketAddress)
+           (java.nio ByteBuffer)
+           (java.nio.channels SocketChannel)))
+
+;; === PROTOCOLLO A FRAME SU SOCKET UNIX ===
+;; Ogni messaggio è un frame: 4 byte di lunghezza (big-endian) + JSON UTF-8.
+;; Il socket dati trasporta richieste e risposte, quello di controllo il
+;; "ready" iniziale e lo shutdown. stdout resta libero per i log.
+
+(def max-frame-size (* 256 1024 1024))
+
+(defn connect [^String path]
+  (doto (SocketChannel/open StandardProtocolFamily/UNIX)
+    (.connect (UnixDomainSocketAddress/of path))))
+
+(defn- read-fully! [^SocketChannel channel ^ByteBuffer buffer]
+  (loop []
+    (cond
+      (not (.hasRemaining buffer)) true
+      (neg? (.read channel buffer)) false
+      :else (recur))))
+
+(defn read-frame
+  "Legge un frame e ne restituisce il JSON decodificato, nil a fine stream"
+  [^SocketChannel channel]
+  (let [header (ByteBuffer/allocate 4)]
+    (when (read-fully! channel header)
+      (.flip header)
+      (let [size (.getInt header)]
+        (when (> size max-frame-size)
+          (throw (ex-info "Frame oltre il limite" {:size size})))
+        (let [body (ByteBuffer/allocate size)]
+          (when (read-fully! channel body)
+            (json/read-str (String. (.array body) "UTF-8") :key-fn keyword)))))))
+
+(defn write-frame!
+  "Scrive un messaggio come frame; sicura se chiamata da più thread"
+  [^SocketChannel channel message]
+  (let [body (.getBytes ^String (json/write-str message) "UTF-8")
+        buffer (doto (ByteBuffer/allocate (+ 4 (alength body)))
+                 (.putInt (alength body))
+                 (.put body)
+                 (.flip))]
+    (locking channel
+      (while (.hasRemaining buffer)
+        (.write channel buffer)))))
+
+;; === KERNEL ===
+(defn handle-request [{:keys [request_id command payload]}]
+  (try
+    (let [result (if (= command "health-check")
+                   {:status "ok"}
+                   (ksn/execute-task {:task command :payload payload}))]
+      (if (and (map? result) (contains? result :error))
+        {:request_id request_id :error (:error result)}
+        {:request_id request_id :result result}))
+    (catch Exception e
+      {:request_id request_id :error (or (.getMessage e) (str (class e)))})))
+
+(defn- serve-control [control]
+  (loop []
+    (let [message (read-frame control)]
+      (if (or (nil? message) (= "shutdown" (:command message)))
+        (System/exit 0)
+        (recur)))))
+
+(defn -main [data-path control-path]
+  (let [data (connect data-path)
+        control (connect control-path)]
+    (write-frame! control {:status "ready"})
+    (future (serve-control control))
+    ;; Le richieste sono servite in parallelo: le risposte portano il request_id
+    (loop []
+      (when-let [request (read-frame data)]
+        (future (write-frame! data (handle-request request)))
+        (recur)))
+    (System/exit 0)))
@@ -63,12 +63,28 @@
        :charge (reduce + (map #(- (:protons %) (:electrons %)) atoms))})))
 
 ;; === Funzione principale per il bridge ===
+(declare execute-task)
+
+(defn execute-batch [tasks]
+  "Esegue i task in ordine: l'errore di un elemento non interrompe il batch"
+  {:results
+   (mapv (fn [task-map]
+           (try
+             (let [result (execute-task task-map)]
+               (if (and (map? result) (contains? result :error))
+                 {:error (:error result)}
+                 {:result result}))
+             (catch Exception e
+               {:error (or (.getMessage e) (str (class e)))})))
+         tasks)})
+
 (defn execute-task [task-map]
   (let [task-type (keyword (:task task-map))
         payload (:payload task-map)]
     (case task-type
       :create-atom (create-atom (keyword (:element payload)))
       :simulate-molecule (simulate-molecule-properties (:atoms payload))
+      :batch (execute-batch (:tasks payload))
       {:error "Unknown task"})))
 
 (defn -main [& args]
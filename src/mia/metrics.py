@@ -0,0 +1,196 @@
+import bisect
+import json
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Bucket di default per durate in secondi (da 0.5 ms a 10 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """Contatore monotono"""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Valore istantaneo, impostato con set() o letto da una funzione al momento della raccolta"""
+
+    __slots__ = ('_value', '_function')
+
+    def __init__(self, function: Optional[Callable[[], Optional[float]]] = None):
+        self._value = 0
+        self._function = function
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._function() if self._function else self._value
+
+
+class Histogram:
+    """
+    Istogramma a bucket fissi, come quelli di Prometheus.
+
+    observe() costa una ricerca binaria e un incremento; i quantili sono
+    stimati per interpolazione lineare dentro il bucket.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # l'ultimo è +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # oltre l'ultimo bucket: limite inferiore
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99)
+        }
+
+
+class MetricsRegistry:
+    """
+    Insieme di metriche con nome ed etichette.
+
+    Ogni componente (agente, manager, bridge) ha il proprio registry; le
+    funzioni render_prometheus() e render_json() ne uniscono più d'uno.
+    """
+
+    def __init__(self, labels: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            labels: Etichette comuni a tutte le metriche del registry (es. {"agent": id})
+        """
+        self.labels: Labels = tuple(sorted((labels or {}).items()))
+        self._metrics: Dict[Tuple[str, Labels], Any] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, kind: str, name: str, help_text: str, labels: Optional[Dict[str, str]], factory):
+        key = (name, self.labels + tuple(sorted((labels or {}).items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = factory()
+                self._help.setdefault(name, (kind, help_text))
+            return metric
+
+    def counter(self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._register("counter", name, help_text, labels, Counter)
+
+    def gauge(self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None,
+              function: Optional[Callable[[], Optional[float]]] = None) -> Gauge:
+        return self._register("gauge", name, help_text, labels, lambda: Gauge(function))
+
+    def histogram(self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None,
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register("histogram", name, help_text, labels, lambda: Histogram(buckets))
+
+    def collect(self) -> List[Tuple[str, str, str, Labels, Any]]:
+        """Metriche registrate come tuple (nome, tipo, help, etichette, metrica)"""
+        with self._lock:
+            items = list(self._metrics.items())
+        return [(name, *self._help[name], labels, metric) for (name, labels), metric in items]
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(registries: Iterable[MetricsRegistry]) -> str:
+    """Esposizione nel formato testuale di Prometheus (text/plain; version=0.0.4)"""
+    families: Dict[str, Tuple[str, str, List]] = {}
+    for registry in registries:
+        for name, kind, help_text, labels, metric in registry.collect():
+            families.setdefault(name, (kind, help_text, []))[2].append((labels, metric))
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, metric in samples:
+            if kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (math.inf,), metric.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+            else:
+                value = metric.value
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot(registries: Iterable[MetricsRegistry]) -> Dict[str, List[Dict[str, Any]]]:
+    """Metriche come dizionario JSON-compatibile: nome -> lista di campioni"""
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    for registry in registries:
+        for name, kind, _, labels, metric in registry.collect():
+            sample = {"labels": dict(labels)}
+            if kind == "histogram":
+                sample.update(metric.snapshot())
+            else:
+                sample["value"] = metric.value
+            result.setdefault(name, []).append(sample)
+    return result
+
+
+def render_json(registries: Iterable[MetricsRegistry]) -> str:
+    return json.dumps(snapshot(registries), indent=2)